@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+ASCII STL 讀取效能比較: 整批解析 (_read_ascii_stl) 與逐行解析 (_read_ascii_stl_by_line)
+
+用法: python benchmark_ascii_stl.py [面數]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from split_stl_to_obj_scale2_w_mtl import STLConverter
+
+
+def write_ascii_stl(filename, n_triangles, seed=0):
+    """產生隨機三角形的 ASCII STL 檔案"""
+    rng = np.random.default_rng(seed)
+    with open(filename, 'w') as f:
+        f.write("solid benchmark\n")
+        for start in range(0, n_triangles, 10000):
+            count = min(10000, n_triangles - start)
+            normals = rng.uniform(-1, 1, size=(count, 3)).astype(np.float32)
+            triangles = rng.uniform(-500, 500, size=(count, 3, 3)).astype(np.float32)
+            lines = []
+            for normal, triangle in zip(normals.tolist(), triangles.tolist(), strict=True):
+                lines.append("  facet normal %e %e %e\n    outer loop\n" % tuple(normal))
+                for vertex in triangle:
+                    lines.append("      vertex %e %e %e\n" % tuple(vertex))
+                lines.append("    endloop\n  endfacet\n")
+            f.write(''.join(lines))
+        f.write("endsolid benchmark\n")
+
+
+def best_of(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == "__main__":
+    n_triangles = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        stl_file = os.path.join(tmpdir, "benchmark_ascii.stl")
+        write_ascii_stl(stl_file, n_triangles)
+        size_mb = os.path.getsize(stl_file) / 1e6
+
+        converter = STLConverter(stl_file, scale=0.001)
+        line_time, (line_triangles, line_normals) = best_of(converter._read_ascii_stl_by_line)
+        bulk_time, (bulk_triangles, bulk_normals) = best_of(converter._read_ascii_stl)
+
+        assert np.array_equal(line_triangles, bulk_triangles)
+        assert np.array_equal(line_normals, bulk_normals)
+
+        print(f"檔案: {n_triangles} 個面, {size_mb:.1f} MB")
+        print(f"逐行解析: {line_time:.3f} s ({size_mb / line_time:.1f} MB/s)")
+        print(f"整批解析: {bulk_time:.3f} s ({size_mb / bulk_time:.1f} MB/s)")
+        print(f"加速倍數: {line_time / bulk_time:.1f}x")
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Morton 排序對壓縮率的影響: 以原本的面順序與 Z-order 排序分別輸出零件, 比較 zip 與 7z 壓縮後的大小
+
+用法: python benchmark_morton.py [--formats obj,stl,ply] [--shuffle] [STL 檔案 ...]
+未指定檔案時使用同目錄的 openduck_assembly2.stl; --shuffle 先打亂二進制 STL 的面順序,
+模擬合併或處理過的網格 (CAD 匯出的面已依曲面排列, 排序不會改善壓縮)。
+7z 以 Python 內建的 LZMA 壓縮整個 tar 估計 (與 7z 預設的 LZMA2 固實壓縮相同演算法)。
+"""
+
+import argparse
+import contextlib
+import io
+import lzma
+import tarfile
+import tempfile
+import zipfile
+from pathlib import Path
+
+import numpy as np
+from split_stl_to_obj_scale2_w_mtl import OUTPUT_SUFFIXES, STL_FACET_DTYPE, STLConverter
+
+
+def archive_sizes(files):
+    """回傳 (原始大小, zip 大小, 7z 大小)"""
+    raw = sum(path.stat().st_size for path in files)
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+        for path in files:
+            archive.write(path, path.name)
+    tar_buffer = io.BytesIO()
+    with tarfile.open(fileobj=tar_buffer, mode='w') as archive:
+        for path in files:
+            archive.add(path, path.name)
+    solid = lzma.compress(tar_buffer.getvalue(), preset=9 | lzma.PRESET_EXTREME)
+    return raw, len(zip_buffer.getvalue()), len(solid)
+
+
+def shuffled_copy(stl_file, filename, seed=0):
+    """把二進制 STL 的面順序打亂後寫到 filename"""
+    with open(stl_file, 'rb') as f:
+        header = f.read(84)
+        facets = np.frombuffer(f.read(), dtype=STL_FACET_DTYPE)
+    with open(filename, 'wb') as f:
+        f.write(header)
+        f.write(facets[np.random.default_rng(seed).permutation(len(facets))].tobytes())
+
+
+def compare(stl_file, formats, shuffle=False):
+    print(f"{stl_file}{' (面順序打亂)' if shuffle else ''}:")
+    sizes = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if shuffle:
+            shuffled_copy(stl_file, Path(tmpdir, "shuffled.stl"))
+            stl_file = Path(tmpdir, "shuffled.stl")
+        for morton_order in (False, True):
+            output_dir = Path(tmpdir, f"morton_{morton_order}")
+            with contextlib.redirect_stdout(io.StringIO()):
+                STLConverter(str(stl_file), morton_order=morton_order).split_and_convert(
+                    formats=formats, output_dir=output_dir)
+            for output_format in formats:
+                files = sorted(path for path in output_dir.iterdir() if path.suffix in OUTPUT_SUFFIXES[output_format])
+                sizes[output_format, morton_order] = archive_sizes(files)
+    for output_format in formats:
+        before, after = sizes[output_format, False], sizes[output_format, True]
+        print(f"  {output_format.upper():4s}" + "".join(
+            f"  {name} {old / 1024:8.1f} -> {new / 1024:8.1f} KB ({(new - old) / old:+6.1%})"
+            for name, old, new in zip(("原始", "zip", "7z"), before, after, strict=True)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="比較 Morton 排序前後的壓縮大小")
+    parser.add_argument("stl_files", nargs='*', default=["openduck_assembly2.stl"])
+    parser.add_argument("--formats", default="obj,stl,ply", help="比較的輸出格式, 以逗號分隔")
+    parser.add_argument("--shuffle", action='store_true', help="先打亂 STL 的面順序 (僅限二進制 STL)")
+    args = parser.parse_args()
+    for stl_file in args.stl_files:
+        compare(stl_file, tuple(args.formats.split(',')), args.shuffle)
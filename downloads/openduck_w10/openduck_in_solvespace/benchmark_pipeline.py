@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+轉換流程基準測試: 以合成的二進制與 ASCII STL 組立件, 分別量測讀取、焊接、分割、輸出各階段的時間與峰值記憶體
+
+用法: python benchmark_pipeline.py [--sizes 10000,100000,1000000,5000000] [--parts 20]
+                                  [--ascii-max 1000000] [--repeat 3] [--output benchmark.json]
+                                  [--compare 舊的結果.json]
+結果寫成 JSON (附 git commit), 以 --compare 與其他 commit 的結果比較各階段的時間比。
+ASCII 檔案約為二進制的 5 倍大, 超過 --ascii-max 個面的大小只測二進制。
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from split_stl_to_obj_scale2_w_mtl import STL_FACET_DTYPE, STLConverter
+
+STAGES = ('read', 'weld', 'split', 'write')
+
+
+def synthetic_assembly(n_parts, n_facets, seed=0):
+    """n_parts 塊互不相連的格網板 (mm), 共約 n_facets 個面, 面的順序打亂"""
+    side = max(int(np.sqrt(n_facets / n_parts / 2)), 1)
+    j, i = np.meshgrid(np.arange(side), np.arange(side), indexing='ij')
+    p00 = np.stack([i, j, np.zeros_like(i)], axis=-1).reshape(-1, 3).astype(np.float32)
+    plate = np.concatenate([
+        np.stack([p00, p00 + np.float32([1, 0, 0]), p00 + np.float32([1, 1, 0])], axis=1),
+        np.stack([p00, p00 + np.float32([1, 1, 0]), p00 + np.float32([0, 1, 0])], axis=1),
+    ])
+    triangles = np.concatenate([plate + np.float32([0, 0, 10 * k]) for k in range(n_parts)])
+    return triangles[np.random.default_rng(seed).permutation(len(triangles))]
+
+
+def write_binary(filename, triangles):
+    facets = np.zeros(len(triangles), dtype=STL_FACET_DTYPE)
+    facets['normal'] = [0, 0, 1]
+    facets['vertices'] = triangles
+    with open(filename, 'wb') as f:
+        f.write(b'\x00' * 80)
+        f.write(np.uint32(len(facets)).tobytes())
+        f.write(facets.tobytes())
+
+
+def write_ascii(filename, triangles, block=100000):
+    facet = ("  facet normal 0 0 1\n    outer loop\n"
+             + "      vertex %r %r %r\n" * 3
+             + "    endloop\n  endfacet\n")
+    with open(filename, 'w') as f:
+        f.write("solid benchmark\n")
+        for start in range(0, len(triangles), block):
+            chunk = triangles[start:start + block].astype(np.float64)
+            f.write(facet * len(chunk) % tuple(chunk.ravel().tolist()))
+        f.write("endsolid benchmark\n")
+
+
+def run_stages(stl_file, output_dir, measure_memory):
+    """依序執行各階段, 回傳 {階段: 秒數} 或 {階段: 峰值 bytes}"""
+    results = {}
+    converter = STLConverter(stl_file, scale=0.001)
+
+    def stage(name, func, *args):
+        if measure_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            value = func(*args)
+            results[name] = tracemalloc.get_traced_memory()[1] - base
+        else:
+            start = time.perf_counter()
+            value = func(*args)
+            results[name] = time.perf_counter() - start
+        return value
+
+    triangles, normals = stage('read', converter._read_binary_stl if converter.is_binary else converter._read_ascii_stl)
+    vertices, faces = stage('weld', converter._weld_vertices, triangles)
+    del triangles
+    components = stage('split', converter._split_by_connected_components, faces, len(vertices))
+
+    def write():
+        for i, component in enumerate(components):
+            converter._write_obj(output_dir / f"part_{i + 1}.obj", vertices, faces[component], normals[component])
+    stage('write', write)
+    return results, len(components)
+
+
+def benchmark(stl_file, repeat):
+    with tempfile.TemporaryDirectory() as output_dir:
+        output_dir = Path(output_dir)
+        seconds = None
+        for _ in range(repeat):
+            timing, part_count = run_stages(stl_file, output_dir, measure_memory=False)
+            seconds = timing if seconds is None else {k: min(seconds[k], timing[k]) for k in STAGES}
+        tracemalloc.start()
+        try:
+            peaks, _ = run_stages(stl_file, output_dir, measure_memory=True)
+        finally:
+            tracemalloc.stop()
+    return {name: {'seconds': seconds[name], 'peak_bytes': peaks[name]} for name in STAGES}, part_count
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_file):
+    """列出與舊結果相同設定的各階段時間比 (舊 / 新, 大於 1 表示變快)"""
+    with open(baseline_file, encoding='utf-8') as f:
+        baseline = json.load(f)
+    old = {(r['format'], r['facets'], r['parts']): r for r in baseline['results']}
+    print(f"\n與 {baseline_file} ({baseline.get('commit')}) 比較, 數值為 舊時間 / 新時間:")
+    for result in results:
+        previous = old.get((result['format'], result['facets'], result['parts']))
+        if previous is None:
+            continue
+        ratios = '  '.join(f"{name} {previous['stages'][name]['seconds'] / max(result['stages'][name]['seconds'], 1e-9):5.2f}x"
+                           for name in STAGES)
+        print(f"  {result['format']:6s} {result['facets']:>9d} 個面: {ratios}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="STLConverter 各階段的時間與峰值記憶體")
+    parser.add_argument("--sizes", default="10000,100000,1000000,5000000", help="面數, 以逗號分隔")
+    parser.add_argument("--parts", type=int, default=20, help="每個組立件的零件數")
+    parser.add_argument("--ascii-max", type=int, default=1000000, help="ASCII 檔案的最大面數")
+    parser.add_argument("--repeat", type=int, default=3, help="時間取幾次中的最小值")
+    parser.add_argument("--output", default="benchmark_pipeline.json", help="結果 JSON 檔")
+    parser.add_argument("--compare", default=None, help="與另一個結果 JSON 比較")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n_facets in (int(size) for size in args.sizes.split(',')):
+            triangles = synthetic_assembly(args.parts, n_facets)
+            for stl_format, writer in (('binary', write_binary), ('ascii', write_ascii)):
+                if stl_format == 'ascii' and n_facets > args.ascii_max:
+                    continue
+                stl_file = os.path.join(tmpdir, f"synthetic_{stl_format}.stl")
+                writer(stl_file, triangles)
+                stages, part_count = benchmark(stl_file, args.repeat)
+                os.remove(stl_file)
+                results.append({'format': stl_format, 'facets': len(triangles), 'parts': part_count, 'stages': stages})
+                print(f"{stl_format:6s} {len(triangles):>9d} 個面, {part_count} 個零件: " + '  '.join(
+                    f"{name} {stages[name]['seconds']:.3f} s / {stages[name]['peak_bytes'] / 2 ** 20:.0f} MB"
+                    for name in STAGES))
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"結果已儲存到: {args.output}")
+    if args.compare:
+        compare(results, args.compare)
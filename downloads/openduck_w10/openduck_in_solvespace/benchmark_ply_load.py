@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+零件載入時間比較: 同一組零件分別輸出為文字 OBJ 與二進制 PLY, 比較檔案大小與讀取時間
+
+用法: python benchmark_ply_load.py [STL 檔案 ...]
+未指定檔案時使用同目錄的 openduck_assembly2.stl 以及約 100 萬個面的合成組立件
+有安裝 trimesh 時另外比較 trimesh.load 的讀取時間
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from benchmark_split import synthetic_assembly
+from split_stl_to_obj_scale2_w_mtl import STL_FACET_DTYPE, STLConverter, read_binary_ply
+
+try:
+    import trimesh
+except ImportError:
+    trimesh = None
+
+
+def read_obj(filename):
+    """逐行讀取 OBJ 的頂點與面, 相當於一般文字格式載入器的工作量"""
+    vertices = []
+    faces = []
+    with open(filename, encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('v '):
+                vertices.append(line.split()[1:4])
+            elif line.startswith('f '):
+                faces.append([corner.split('/')[0] for corner in line.split()[1:4]])
+    return np.array(vertices, dtype=np.float64), np.array(faces, dtype=np.int32) - 1
+
+
+def load_all(loader, files):
+    """依序載入所有檔案, 回傳最佳的總時間 (3 次取最小值)"""
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        for filename in files:
+            loader(filename)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def compare(name, stl_file):
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                part_count = STLConverter(stl_file, scale=0.001).split_and_convert(formats=('obj', 'ply'))
+        finally:
+            os.chdir(cwd)
+        parts = Path(workdir) / 'split_parts'
+        obj_files = sorted(parts.glob('*.obj'))
+        ply_files = sorted(parts.glob('*.ply'))
+        obj_bytes = sum(p.stat().st_size for p in obj_files) + sum(p.stat().st_size for p in parts.glob('*.mtl'))
+        ply_bytes = sum(p.stat().st_size for p in ply_files)
+
+        obj_time = load_all(read_obj, obj_files)
+        ply_time = load_all(read_binary_ply, ply_files)
+        print(f"{name}: {part_count} 個零件")
+        print(f"  OBJ + MTL: {obj_bytes / 1e6:.2f} MB, 逐行讀取 {obj_time:.3f} s")
+        print(f"  PLY:       {ply_bytes / 1e6:.2f} MB ({obj_bytes / ply_bytes:.1f}x 小), "
+              f"讀取 {ply_time:.4f} s ({obj_time / ply_time:.0f}x)")
+        if trimesh is not None:
+            obj_time = load_all(lambda p: trimesh.load(p, process=False), obj_files)
+            ply_time = load_all(lambda p: trimesh.load(p, process=False), ply_files)
+            print(f"  trimesh.load: OBJ {obj_time:.3f} s, PLY {ply_time:.3f} s ({obj_time / ply_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    stl_files = sys.argv[1:]
+    if not stl_files and os.path.exists("openduck_assembly2.stl"):
+        stl_files = ["openduck_assembly2.stl"]
+
+    for stl_file in stl_files:
+        compare(stl_file, os.path.abspath(stl_file))
+
+    if len(sys.argv) == 1:
+        triangles = synthetic_assembly() / 0.001
+        facets = np.zeros(len(triangles), dtype=STL_FACET_DTYPE)
+        facets['vertices'] = triangles
+        with tempfile.TemporaryDirectory() as tmp:
+            stl_file = os.path.join(tmp, 'synthetic.stl')
+            with open(stl_file, 'wb') as f:
+                f.write(b'\x00' * 80)
+                f.write(np.uint32(len(facets)).tobytes())
+                f.write(facets.tobytes())
+            compare("合成組立件", stl_file)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+零件分割效能比較: 舊版以座標 tuple 建字典並以 DFS 走訪, 新版焊接頂點後以陣列 union-find 標記
+
+用法: python benchmark_split.py [STL 檔案 ...]
+未指定檔案時使用同目錄的 openduck_assembly2.stl 以及約 100 萬個面的合成組立件
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from split_stl_to_obj_scale2_w_mtl import STLConverter
+
+
+def legacy_split(triangles):
+    """舊版 _split_by_connected_components"""
+    vertex_to_triangle = {}
+    for i, triangle in enumerate(triangles):
+        for vertex in triangle:
+            vertex_tuple = tuple(vertex)
+            if vertex_tuple in vertex_to_triangle:
+                vertex_to_triangle[vertex_tuple].append(i)
+            else:
+                vertex_to_triangle[vertex_tuple] = [i]
+
+    visited = set()
+    components = []
+
+    def dfs(triangle_idx):
+        component = []
+        stack = [triangle_idx]
+
+        while stack:
+            current = stack.pop()
+            if current not in visited:
+                visited.add(current)
+                component.append(current)
+
+                for vertex in triangles[current]:
+                    vertex_tuple = tuple(vertex)
+                    for neighbor in vertex_to_triangle[vertex_tuple]:
+                        if neighbor not in visited:
+                            stack.append(neighbor)
+
+        return component
+
+    for i in range(len(triangles)):
+        if i not in visited:
+            components.append(dfs(i))
+
+    return components
+
+
+def synthetic_assembly(n_parts=20, facets_per_part=50000, seed=0):
+    """n_parts 塊互不相連的格網板, 面的順序打亂"""
+    side = int(np.sqrt(facets_per_part / 2))
+    j, i = np.meshgrid(np.arange(side), np.arange(side), indexing='ij')
+    p00 = np.stack([i, j, np.zeros_like(i)], axis=-1).reshape(-1, 3).astype(np.float64)
+    plate = np.concatenate([
+        np.stack([p00, p00 + [1, 0, 0], p00 + [1, 1, 0]], axis=1),
+        np.stack([p00, p00 + [1, 1, 0], p00 + [0, 1, 0]], axis=1),
+    ])
+    triangles = np.concatenate([plate + [0, 0, 10 * k] for k in range(n_parts)]) * 0.001
+    rng = np.random.default_rng(seed)
+    return triangles[rng.permutation(len(triangles))]
+
+
+def compare(name, triangles):
+    start = time.perf_counter()
+    legacy = legacy_split(triangles)
+    legacy_time = time.perf_counter() - start
+
+    converter = STLConverter.__new__(STLConverter)
+    converter.weld_tolerance = 0.0
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        vertices, faces = converter._weld_vertices(triangles)
+        components = converter._split_by_connected_components(faces, len(vertices))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    assert sorted(sorted(c) for c in legacy) == sorted(c.tolist() for c in components)
+    print(f"{name}: {len(triangles)} 個面, {len(components)} 個零件")
+    print(f"  舊版 tuple + DFS: {legacy_time:.3f} s")
+    print(f"  焊接 + union-find: {best:.3f} s ({legacy_time / best:.0f}x)")
+
+
+if __name__ == "__main__":
+    stl_files = sys.argv[1:]
+    if not stl_files and os.path.exists("openduck_assembly2.stl"):
+        stl_files = ["openduck_assembly2.stl"]
+
+    for stl_file in stl_files:
+        converter = STLConverter(stl_file, scale=0.001)
+        if converter.is_binary:
+            triangles, _ = converter._read_binary_stl()
+        else:
+            triangles, _ = converter._read_ascii_stl()
+        compare(stl_file, triangles)
+
+    if len(sys.argv) == 1:
+        compare("合成組立件", synthetic_assembly())
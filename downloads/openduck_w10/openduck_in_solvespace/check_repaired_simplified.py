@@ -1,33 +1,237 @@
-# pip install trimesh numpy networkx fast_simplification
+# pip install trimesh numpy networkx fast_simplification (依誤差簡化 --max-error 另需 scipy)
 import trimesh
 import numpy as np
+import argparse
+import contextlib
+import io
+import json
 import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-def check_repair_simplify_obj(input_path, output_dir, temp_dir, simplify_ratio=0.5):
+def repair_mesh(mesh):
     """
-    檢查、修復並簡化 .obj 文件，模擬分開版本的流程。
-    
+    在同一個 mesh 物件上依序嘗試修復非閉合的模型。
+
+    回傳：
+        bool: 修復後是否閉合
+    """
+    if mesh.is_watertight:
+        print("模型已經閉合，無需修復")
+        return True
+
+    print("警告: 模型非閉合，正在嘗試修復...")
+
+    # 方法 1: 填充孔洞
+    try:
+        mesh.fill_holes()
+        print(f"填充孔洞後是否閉合: {mesh.is_watertight}")
+    except Exception as e:
+        print(f"填充孔洞失敗: {str(e)}")
+
+    # 方法 2: 修復非流形邊緣
+    if not mesh.is_watertight:
+        try:
+            trimesh.repair.fix_non_manifold(mesh)
+            print(f"修復非流形邊緣後是否閉合: {mesh.is_watertight}")
+        except Exception as e:
+            print(f"修復非流形邊緣失敗: {str(e)}")
+
+    # 方法 3: 統一法線並再次填充
+    if not mesh.is_watertight:
+        try:
+            trimesh.repair.fix_normals(mesh)
+            mesh.fill_holes()
+            print(f"統一法線並再次填充孔洞後是否閉合: {mesh.is_watertight}")
+        except Exception as e:
+            print(f"統一法線並填充孔洞失敗: {str(e)}")
+
+    if not mesh.is_watertight:
+        print("警告: 修復後模型仍非閉合，建議使用 Blender 或 MeshLab 進行手動修復")
+    return mesh.is_watertight
+
+class SurfaceDistance:
+    """
+    以 KD-tree 估計點到網格表面的距離。
+
+    表面取樣點與各面的重心放入 KD-tree，查詢時取最近的 k 個取樣點所在的面，
+    再計算到這些三角形的精確距離，取最小值。
+    """
+
+    def __init__(self, mesh, samples, k=8, seed=0):
+        # 只有依誤差簡化時需要 scipy, 依比例簡化不必安裝
+        from scipy.spatial import cKDTree
+
+        points, sample_faces = trimesh.sample.sample_surface(mesh, samples, seed=seed)
+        self.triangles = mesh.triangles
+        self.faces = np.concatenate([sample_faces, np.arange(len(mesh.faces))])
+        self.tree = cKDTree(np.concatenate([points, mesh.triangles_center]))
+        # 查詢點: 表面取樣點與所有頂點
+        self.points = np.concatenate([points, mesh.vertices])
+        self.k = min(k, len(self.faces))
+
+    def distances(self, points):
+        """每個點到網格表面的距離"""
+        _, nearest = self.tree.query(points, k=self.k)
+        nearest = nearest.reshape(len(points), -1)
+        repeated = np.repeat(points, nearest.shape[1], axis=0)
+        closest = trimesh.triangles.closest_point(self.triangles[self.faces[nearest.ravel()]], repeated)
+        return np.linalg.norm(closest - repeated, axis=1).reshape(len(points), -1).min(axis=1)
+
+    def max_distance(self, points, batch=1024):
+        """
+        points 到網格表面的最大距離。
+
+        到最近取樣點的距離是精確距離的上界，因此依上界由大到小分批精算，
+        直到剩下的上界都不超過已知的最大值為止，大部分的點不必精算。
+        """
+        upper, _ = self.tree.query(points)
+        order = np.argsort(upper)[::-1]
+        result = 0.0
+        for start in range(0, len(order), batch):
+            chunk = order[start:start + batch]
+            if upper[chunk[0]] <= result:
+                break
+            result = max(result, self.distances(points[chunk]).max())
+        return result
+
+def hausdorff_estimate(original, simplified, samples=20000):
+    """
+    以取樣點估計兩個網格的 Hausdorff 距離 (雙向最大距離)，original 可傳入已建立的 SurfaceDistance 重複使用。
+    """
+    if not isinstance(original, SurfaceDistance):
+        original = SurfaceDistance(original, samples)
+    other = SurfaceDistance(simplified, samples)
+    return max(original.max_distance(other.points), other.max_distance(original.points))
+
+def _error_samples(mesh, max_error):
+    """依表面積使取樣間距約為 max_error 的取樣點數 (介於 2000 與 20000 點之間)"""
+    return int(np.clip(mesh.area / max(max_error, 1e-12) ** 2, 2000, 20000))
+
+def simplify_to_error(mesh, max_error, samples=None, tolerance=0.01, min_faces=10):
+    """
+    在誤差不超過 max_error (模型單位) 的前提下，以二分法找出面數最少的 quadric decimation 結果。
+
+    誤差以 hausdorff_estimate 估計，samples 為每個網格的表面取樣點數，None 表示依表面積
+    使取樣間距約為 max_error (介於 2000 與 20000 點之間)；每個試過的目標面數的簡化結果都暫存起來，
+    不重複計算。目標面數的搜尋範圍縮小到原面數的 tolerance 以內即停止。
+
+    回傳：
+        (trimesh.Trimesh, float, int): 簡化後的模型、估計誤差、試過的目標面數個數；
+        無法在誤差內簡化時回傳原本的 mesh 與誤差 0
+    """
+    if samples is None:
+        samples = _error_samples(mesh, max_error)
+    reference = SurfaceDistance(mesh, samples)
+    decimations = {}
+
+    def decimate(face_count):
+        if face_count not in decimations:
+            candidate = mesh.simplify_quadric_decimation(face_count=face_count)
+            decimations[face_count] = (candidate, hausdorff_estimate(reference, candidate, samples))
+        return decimations[face_count]
+
+    # high 一定符合誤差 (原本的模型)，low 在二分過程中一律不符合
+    low, high = min(min_faces, len(mesh.faces)), len(mesh.faces)
+    if decimate(low)[1] <= max_error:
+        high = low
+    step = max(1, int(tolerance * len(mesh.faces)))
+    while high - low > step:
+        middle = (low + high) // 2
+        if decimate(middle)[1] <= max_error:
+            high = middle
+        else:
+            low = middle
+
+    if high == len(mesh.faces):
+        return mesh, 0.0, len(decimations)
+    simplified_mesh, error = decimations[high]
+    return simplified_mesh, error, len(decimations)
+
+def simplify_mesh(mesh, simplify_ratio, max_error=None):
+    """
+    以 quadric decimation 簡化模型，簡化後非閉合時嘗試填充孔洞。
+
+    指定 max_error (模型單位) 時不使用 simplify_ratio，改為以 simplify_to_error 找出誤差內面數最少的結果。
+
+    回傳：
+        (trimesh.Trimesh, float): 簡化後的模型與估計誤差 (依比例簡化時為 None)；
+        不簡化或簡化失敗時回傳原本的 mesh。簡化後又填充孔洞時，誤差依填充後 (實際寫出) 的模型重新估計，
+        可能略大於 max_error
+    """
+    error = None
+    try:
+        if max_error is not None:
+            print(f"正在簡化模型，最大誤差: {max_error}")
+            simplified_mesh, error, tried = simplify_to_error(mesh, max_error)
+            print(f"試過 {tried} 種面數，估計誤差: {error:.6g}")
+        elif simplify_ratio >= 1.0:
+            print("未進行簡化")
+            return mesh, error
+        else:
+            print(f"正在簡化模型，目標面數比例: {simplify_ratio}")
+            target_face_count = max(10, int(len(mesh.faces) * simplify_ratio))  # 確保至少保留 10 個面
+            simplified_mesh = mesh.simplify_quadric_decimation(face_count=target_face_count)
+    except Exception as e:
+        print(f"簡化模型時發生錯誤: {str(e)}")
+        print("將使用修復後的模型（未簡化）")
+        return mesh, None
+
+    # 檢查簡化後的模型
+    print(f"簡化後頂點數: {len(simplified_mesh.vertices)}")
+    print(f"簡化後面數: {len(simplified_mesh.faces)}")
+    print(f"簡化後是否閉合: {simplified_mesh.is_watertight}")
+
+    # 如果簡化後非閉合，嘗試修復
+    if not simplified_mesh.is_watertight:
+        print("警告: 簡化後模型非閉合，嘗試修復...")
+        face_count = len(simplified_mesh.faces)
+        try:
+            simplified_mesh.fill_holes()
+            print(f"修復後是否閉合: {simplified_mesh.is_watertight}")
+        except Exception as e:
+            print(f"簡化後修復失敗: {str(e)}")
+        if error is not None and len(simplified_mesh.faces) != face_count:
+            error = hausdorff_estimate(mesh, simplified_mesh, _error_samples(mesh, max_error))
+            print(f"填充孔洞後的估計誤差: {error:.6g}")
+    return simplified_mesh, error
+
+def check_repair_simplify_obj(input_path, output_dir, temp_dir=None, simplify_ratio=0.5, max_error=None):
+    """
+    檢查、修復並簡化 .obj 文件。
+
+    只在開始時載入一次，修復、簡化與最後的檢查都在記憶體中的模型上進行，
+    檔案只寫出一次最終結果；指定 temp_dir 時才另外儲存修復後的中間文件（供比對除錯）。
+
     參數：
         input_path (str): 輸入的 .obj 文件路徑
         output_dir (str): 修復且簡化後的輸出目錄
-        temp_dir (str): 修復後的中間文件儲存目錄
+        temp_dir (str): 修復後的中間文件儲存目錄，None 表示不儲存
         simplify_ratio (float): 簡化比例（0 到 1，1 表示不簡化，0.5 表示減少到 50% 面數）
+        max_error (float): 允許的最大幾何誤差（模型單位），指定時依誤差而非比例簡化
+
+    回傳：
+        dict: 各階段的頂點數、面數與是否閉合，發生錯誤時 error 為錯誤訊息
     """
+    result = {'input': input_path, 'output': None, 'error': None, 'max_error': max_error}
     try:
-        # 確保輸出目錄和臨時目錄存在
+        # 確保輸出目錄存在
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
-        if not os.path.exists(temp_dir):
-            os.makedirs(temp_dir)
-        
+
         # 獲取文件名
         filename = os.path.basename(input_path)
-        temp_path = os.path.join(temp_dir, filename.replace(".obj", "_repaired.obj"))
         output_path = os.path.join(output_dir, filename.replace(".obj", "_repaired_simplified.obj"))
-        
+
         # 載入 .obj 文件
         mesh = trimesh.load(input_path, file_type='obj', force='mesh')
-        
+        # 每個面各有法向量的 OBJ 載入後, 頂點會依法向量分開; 先焊接回共用頂點, 閉合判斷、修復與簡化才有意義
+        # (原本要等到中間文件重新載入時才焊接, 在那之前的修復都作用在分開的三角形上)
+        mesh.merge_vertices()
+
         # 檢查基本屬性
         print(f"\n=== 正在檢查文件: {input_path} ===")
         print(f"頂點數: {len(mesh.vertices)}")
@@ -35,118 +239,183 @@ def check_repair_simplify_obj(input_path, output_dir, temp_dir, simplify_ratio=0
         print(f"是否閉合 (watertight): {mesh.is_watertight}")
         print(f"是否為單一體積: {mesh.is_volume}")
         print(f"邊界框尺寸: {mesh.extents}")
-        
+        result.update(vertices=len(mesh.vertices), faces=len(mesh.faces), watertight=bool(mesh.is_watertight))
+
         # 如果模型非閉合，嘗試修復
-        if not mesh.is_watertight:
-            print("警告: 模型非閉合，正在嘗試修復...")
-            
-            # 方法 1: 填充孔洞
-            try:
-                mesh.fill_holes()
-                print(f"填充孔洞後是否閉合: {mesh.is_watertight}")
-            except Exception as e:
-                print(f"填充孔洞失敗: {str(e)}")
-            
-            # 方法 2: 修復非流形邊緣
-            if not mesh.is_watertight:
-                try:
-                    trimesh.repair.fix_non_manifold(mesh)
-                    print(f"修復非流形邊緣後是否閉合: {mesh.is_watertight}")
-                except Exception as e:
-                    print(f"修復非流形邊緣失敗: {str(e)}")
-            
-            # 方法 3: 統一法線並再次填充
-            if not mesh.is_watertight:
-                try:
-                    trimesh.repair.fix_normals(mesh)
-                    mesh.fill_holes()
-                    print(f"統一法線並再次填充孔洞後是否閉合: {mesh.is_watertight}")
-                except Exception as e:
-                    print(f"統一法線並填充孔洞失敗: {str(e)}")
-            
-            # 儲存修復後的中間文件
+        result['repaired_watertight'] = bool(repair_mesh(mesh))
+
+        if temp_dir is not None:
+            if not os.path.exists(temp_dir):
+                os.makedirs(temp_dir)
+            temp_path = os.path.join(temp_dir, filename.replace(".obj", "_repaired.obj"))
             mesh.export(temp_path, file_type='obj')
             print(f"修復後的模型已儲存至中間文件: {temp_path}")
-            
-            # 重新載入修復後的模型
-            if os.path.exists(temp_path):
-                mesh = trimesh.load(temp_path, file_type='obj', force='mesh')
-                print(f"重新載入修復後模型，是否閉合: {mesh.is_watertight}")
-                if not mesh.is_watertight:
-                    print("警告: 修復後模型仍非閉合，建議使用 Blender 或 MeshLab 進行手動修復")
-            else:
-                print(f"錯誤: 無法生成中間文件 {temp_path}")
-                return
-        else:
-            print("模型已經閉合，無需修復，直接儲存到中間文件")
-            mesh.export(temp_path, file_type='obj')
-            mesh = trimesh.load(temp_path, file_type='obj', force='mesh')
-        
-        # 簡化模型
-        if simplify_ratio < 1.0:
-            print(f"正在簡化模型，目標面數比例: {simplify_ratio}")
-            target_face_count = max(10, int(len(mesh.faces) * simplify_ratio))  # 確保至少保留 10 個面
-            
-            try:
-                simplified_mesh = mesh.simplify_quadric_decimation(face_count=target_face_count)
-                
-                # 檢查簡化後的模型
-                print(f"簡化後頂點數: {len(simplified_mesh.vertices)}")
-                print(f"簡化後面數: {len(simplified_mesh.faces)}")
-                print(f"簡化後是否閉合: {simplified_mesh.is_watertight}")
-                
-                # 如果簡化後非閉合，嘗試修復
-                if not simplified_mesh.is_watertight:
-                    print("警告: 簡化後模型非閉合，嘗試修復...")
-                    try:
-                        simplified_mesh.fill_holes()
-                        print(f"修復後是否閉合: {simplified_mesh.is_watertight}")
-                    except Exception as e:
-                        print(f"簡化後修復失敗: {str(e)}")
-                
-                # 儲存簡化後的模型
-                simplified_mesh.export(output_path, file_type='obj')
-                print(f"修復且簡化後的模型已儲存至: {output_path}")
-            except Exception as e:
-                print(f"簡化模型時發生錯誤: {str(e)}")
-                print("將儲存修復後的模型（未簡化）")
-                mesh.export(output_path, file_type='obj')
-        else:
-            print("未進行簡化，將修復後的模型儲存至輸出路徑")
-            mesh.export(output_path, file_type='obj')
-        
-        # 檢查最終輸出文件
-        if os.path.exists(output_path):
-            print(f"輸出文件 {output_path} 已成功生成")
-            final_mesh = trimesh.load(output_path, file_type='obj', force='mesh')
-            print(f"最終輸出模型是否閉合: {final_mesh.is_watertight}")
-            print(f"最終頂點數: {len(final_mesh.vertices)}")
-            print(f"最終面數: {len(final_mesh.faces)}")
-        else:
-            print(f"錯誤: 無法生成輸出文件 {output_path}")
-            
+
+        # 簡化模型並儲存
+        final_mesh, result['achieved_error'] = simplify_mesh(mesh, simplify_ratio, max_error)
+        final_mesh.export(output_path, file_type='obj')
+        result['output'] = output_path
+        print(f"修復且簡化後的模型已儲存至: {output_path}")
+
+        # 檢查最終輸出的模型 (與寫出的是同一個物件, 不必重新載入)
+        print(f"最終輸出模型是否閉合: {final_mesh.is_watertight}")
+        print(f"最終頂點數: {len(final_mesh.vertices)}")
+        print(f"最終面數: {len(final_mesh.faces)}")
+        result.update(final_vertices=len(final_mesh.vertices), final_faces=len(final_mesh.faces),
+                      final_watertight=bool(final_mesh.is_watertight))
+
     except Exception as e:
         print(f"處理文件時發生錯誤: {str(e)}")
         print("建議檢查文件路徑或使用 Blender/MeshLab 進行手動修復")
+        result['error'] = str(e)
+    return result
+
+def find_parts(input_dir, pattern=r"part_(\d+)\.obj"):
+    """
+    找出 input_dir 中檔名符合 pattern 的零件，依零件編號排序。
+    """
+    parts = []
+    for name in os.listdir(input_dir):
+        match = re.fullmatch(pattern, name)
+        if match:
+            parts.append((int(match.group(1)) if match.groups() else 0, name))
+    return [os.path.join(input_dir, name) for _, name in sorted(parts)]
+
+def _process_part(input_path, output_dir, temp_dir, simplify_ratio, max_error):
+    """
+    處理單一零件並收集它印出的訊息，供批次處理依零件順序輸出。
+    """
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        result = check_repair_simplify_obj(input_path, output_dir, temp_dir, simplify_ratio, max_error)
+    result['seconds'] = time.perf_counter() - start
+    return result, log.getvalue()
+
+def _failed_part(input_path, error):
+    """
+    工作程序失敗 (例外無法傳回或程序異常結束) 時的零件結果與訊息。
+    """
+    result = {'input': input_path, 'output': None, 'error': f"工作程序失敗: {str(error) or type(error).__name__}"}
+    return result, f"\n=== {input_path} 處理失敗: {result['error']} ===\n"
+
+def batch_repair_simplify(input_dir, output_dir, temp_dir=None, simplify_ratio=0.5, workers=None,
+                          report_path=None, pattern=r"part_(\d+)\.obj", max_error=None):
+    """
+    以多個程序平行處理 input_dir 中的所有零件，並把結果彙整成一份 JSON 報告。
+
+    每個零件彼此獨立，輸出與逐一處理相同；單一零件失敗 (包括工作程序異常結束) 只記錄在報告中，
+    不影響其他零件。各零件的訊息依零件順序印出。
+
+    參數：
+        workers (int): 程序數，None 表示使用全部 CPU，1 表示在目前的程序中逐一處理
+        report_path (str): 報告路徑，預設為 output_dir/report.json
+
+    回傳：
+        dict: 報告內容
+    """
+    start = time.perf_counter()
+    parts = find_parts(input_dir, pattern)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    results = []
+
+    if workers <= 1 or len(parts) <= 1:
+        for input_path in parts:
+            result, log = _process_part(input_path, output_dir, temp_dir, simplify_ratio, max_error)
+            print(log, end='')
+            results.append(result)
+    else:
+        arguments = (output_dir, temp_dir, simplify_ratio, max_error)
+        outcomes, unfinished = {}, []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_process_part, input_path, *arguments) for input_path in parts]
+            for input_path, future in zip(parts, futures, strict=True):
+                try:
+                    outcomes[input_path] = future.result()
+                except BrokenProcessPool:
+                    unfinished.append(input_path)
+                except Exception as e:
+                    outcomes[input_path] = _failed_part(input_path, e)
+
+        # 有工作程序異常結束時整個 pool 失效, 未完成的零件全部失敗, 無法分辨是哪一個零件造成的;
+        # 這些零件改為每個零件一個程序重試, 只有真正讓程序結束的零件記為失敗
+        for start_index in range(0, len(unfinished), workers):
+            batch = unfinished[start_index:start_index + workers]
+            executors = [ProcessPoolExecutor(max_workers=1) for _ in batch]
+            try:
+                futures = [executor.submit(_process_part, input_path, *arguments)
+                           for executor, input_path in zip(executors, batch, strict=True)]
+                for input_path, future in zip(batch, futures, strict=True):
+                    try:
+                        outcomes[input_path] = future.result()
+                    except Exception as e:
+                        outcomes[input_path] = _failed_part(input_path, e)
+            finally:
+                for executor in executors:
+                    executor.shutdown()
+
+        for input_path in parts:
+            result, log = outcomes[input_path]
+            print(log, end='')
+            results.append(result)
+
+    processed = [result for result in results if result['error'] is None]
+    report = {
+        'input_dir': input_dir,
+        'output_dir': output_dir,
+        'simplify_ratio': simplify_ratio,
+        'max_error': max_error,
+        'workers': workers,
+        'seconds': time.perf_counter() - start,
+        'summary': {
+            'parts': len(results),
+            'failed': len(results) - len(processed),
+            'watertight': sum(result['watertight'] for result in processed),
+            'repaired_watertight': sum(result['repaired_watertight'] for result in processed),
+            'final_watertight': sum(result['final_watertight'] for result in processed),
+            'faces': sum(result['faces'] for result in processed),
+            'final_faces': sum(result['final_faces'] for result in processed),
+            'max_achieved_error': max((result['achieved_error'] for result in processed
+                                       if result['achieved_error'] is not None), default=None),
+        },
+        'parts': results,
+    }
+    if report_path is None:
+        report_path = os.path.join(output_dir, "report.json")
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    summary = report['summary']
+    print(f"\n共處理 {summary['parts']} 個零件，失敗 {summary['failed']} 個，"
+          f"最終閉合 {summary['final_watertight']} 個，面數 {summary['faces']} -> {summary['final_faces']}，"
+          f"耗時 {report['seconds']:.2f} 秒")
+    if summary['max_achieved_error'] is not None:
+        print(f"各零件的最大估計誤差: {summary['max_achieved_error']:.6g} (上限 {max_error})")
+    print(f"報告已儲存至: {report_path}")
+    return report
+
+def main(argv=None):
+    """
+    命令列入口: 批次檢查、修復並簡化目錄中的所有零件，有零件失敗時回傳 1。
+    """
+    parser = argparse.ArgumentParser(description="批次檢查、修復並簡化 split_parts 中的 OBJ 零件")
+    parser.add_argument("input_dir", nargs='?', default="./split_parts", help="零件所在目錄 (預設 ./split_parts)")
+    parser.add_argument("--output-dir", default="./checked_repaired_simplified", help="最終輸出目錄")
+    parser.add_argument("--temp-dir", default=None, help="另外儲存修復後的中間文件的目錄 (預設不儲存)")
+    parser.add_argument("--ratio", type=float, default=0.5, help="簡化比例 (預設 0.5)")
+    parser.add_argument("--max-error", type=float, default=None,
+                        help="允許的最大幾何誤差 (模型單位，split_parts 為公尺)，指定時依誤差而非比例簡化")
+    parser.add_argument("--workers", type=int, default=0, help="程序數，0 表示使用全部 CPU，1 表示逐一處理")
+    parser.add_argument("--report", default=None, help="JSON 報告路徑 (預設為輸出目錄中的 report.json)")
+    parser.add_argument("--pattern", default=r"part_(\d+)\.obj", help="零件檔名的正規表示式，第一個群組為零件編號")
+    args = parser.parse_args(argv)
+
+    report = batch_repair_simplify(args.input_dir, args.output_dir, args.temp_dir, args.ratio,
+                                   args.workers or None, args.report, args.pattern, args.max_error)
+    return 1 if report['summary']['failed'] else 0
 
 # 使用範例
 if __name__ == "__main__":
-    # 使用者輸入零件數量
-    n_parts = 23
-
-    
-    # 輸入、臨時和輸出目錄
-    input_dir = "./split_parts"  # 零件所在目錄
-    temp_dir = "./repaired"  # 修復後的中間文件目錄
-    output_dir = "./checked_repaired_simplified"  # 最終輸出目錄
-    
-    # 設置簡化比例
-    simplify_ratio = 0.5
-    
-    # 處理 part_1.obj 到 part_n.obj
-    for i in range(1, n_parts + 1):
-        input_obj = os.path.join(input_dir, f"part_{i}.obj")
-        if os.path.exists(input_obj):
-            check_repair_simplify_obj(input_obj, output_dir, temp_dir, simplify_ratio)
-        else:
-            print(f"錯誤: 文件 {input_obj} 不存在，跳過處理")
\ No newline at end of file
+    sys.exit(main())
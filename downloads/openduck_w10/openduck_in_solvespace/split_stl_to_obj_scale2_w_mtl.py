@@ -6,14 +6,142 @@ Author: mdecycu
 Description: STL file converter that splits STL files into multiple OBJ files with MTL materials
 """
 
+import glob
+import hashlib
+import json
+import os
+import shutil
 import struct
+import sys
+import time
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 import numpy as np
 from pathlib import Path
 
+try:
+    import resource
+except ImportError:  # Windows 沒有 resource 模組, 此時不記錄峰值 RSS
+    resource = None
+
+# 二進制 STL 每個面固定 50 bytes: 法向量、三個頂點 (皆為 little-endian float32) 與 2 bytes 屬性
+STL_FACET_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attr', '<u2'),
+])
+
+# 串流模式每次處理的面數; 區塊越大越快, 但暫存記憶體也越大
+DEFAULT_CHUNK_SIZE = 1 << 18
+
+# 串流模式的記憶體上限 (bytes), 由三部分組成:
+#   單一區塊的暫存陣列 (頂點複本、排序鍵、np.unique 的索引) 每個面約 256 bytes
+#   整個模型的面索引 (int32) 與法向量 (float32) 每個面 24 bytes
+#   唯一頂點表 (float32 頂點、排序鍵、編號與最後的 float64 輸出) 每個頂點約 64 bytes
+# 因此峰值只與 chunk_size 及頂點索引大小有關, 不會隨 STL 檔案大小倍增
+STREAM_BYTES_PER_CHUNK_FACET = 256
+STREAM_BYTES_PER_FACET = 24
+STREAM_BYTES_PER_VERTEX = 64
+
+# OBJ 每次整塊格式化並寫入的列數
+OBJ_WRITE_CHUNK_ROWS = 1 << 16
+
+# 二進制 PLY 的面資料: 頂點數 (固定為 3) 與 int32 頂點編號, 不對齊共 13 bytes
+PLY_FACE_DTYPE = np.dtype([('count', 'u1'), ('indices', '<i4', (3,))])
+
+# 平滑法向量去重的容許誤差 (單位向量的分量), 遠小於肉眼可辨的差異
+NORMAL_WELD_TOLERANCE = 1e-6
+# 平滑法向量每次處理的角點對數; 角點對數為各頂點相鄰面數的平方和, 分批處理使記憶體
+# 不隨細分的圓盤、圓柱端面中心等高相鄰面數頂點成平方成長
+NORMAL_PAIR_CHUNK = 1 << 20
+# 相鄰面數超過此值的頂點改以矩陣乘法逐一處理
+NORMAL_DENSE_VALENCE = 64
+
+# 判斷兩個零件形狀相同的容許誤差, 相對於零件座標的最大絕對值
+# (float32 座標約有 1e-7 的相對誤差, 旋轉後仍遠小於此值)
+INSTANCE_TOLERANCE = 1e-5
+
+# Morton 碼每個軸的位元數, 三軸交錯後共 63 位元
+MORTON_BITS = 21
+
+# 每種輸出格式寫出的檔案, 依摘要中列出的順序
+OUTPUT_SUFFIXES = {'stl': ('.stl',), 'obj': ('.obj', '.mtl'), 'ply': ('.ply',), 'qmesh': ('.qmesh',)}
+
+# 量化網格容器 (.qmesh): 檔頭為 magic、版本與 JSON 說明的長度 (little-endian uint32), 接著是 JSON 說明
+# (補空白到 4 bytes 的倍數) 與各網格的資料區塊; 說明中記錄每個網格的包圍盒、量化步長與資料區塊
+# (buffers, 相對於 JSON 說明結尾的位置與長度)
+QMESH_MAGIC = b'QMSH'
+QMESH_VERSION = 1
+QMESH_HEADER = struct.Struct('<4sII')
+# 座標以包圍盒內的 16 位元整數表示, 法向量以八面體投影的兩個 8 位元整數表示
+QMESH_POSITION_BITS = 16
+QMESH_NORMAL_BITS = 8
+
+# 增量分割時, 新零件與上次零件相符的門檻:
+# 重心距離 / 上次零件的包圍盒對角線 + |ln(對角線比)| 小於此值才視為同一零件
+INCREMENTAL_MATCH_LIMIT = 0.5
+
+# 分割結果快取的預設容量上限 (bytes), 超過時刪除最久未使用的結果
+DEFAULT_CACHE_SIZE_LIMIT = 1 << 30
+# 輸出格式改變時遞增, 使舊的快取失效
+CACHE_VERSION = 2
+
+# 外部記憶體分割的暫存檔格式: 分桶時的 (頂點格點, 角點編號), 以及依零件排好的面資料
+BUCKET_RECORD_DTYPE = np.dtype([('grid', '<i8', (3,)), ('corner', '<i8')])
+ROUTED_FACET_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('ids', '<i4', (3,)),
+])
+
+# 焊接頂點時把 (x, y, z) 格點混合成一個 64 位元雜湊的乘數 (溢位時自然取模)
+VERTEX_HASH_MULTIPLIERS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9],
+                                   dtype=np.uint64).view(np.int64)
+# 外部記憶體分割同時開啟的桶檔數上限, 低於常見的檔案代號上限 (Linux 預設 1024, macOS 預設 256);
+# 超過 3 * chunk_size 個角點的桶再以下一層雜湊分成子桶, 最多 BUCKET_LEVELS 層
+MAX_OPEN_BUCKETS = 128
+BUCKET_LEVELS = 4
+# 每往下一層, 雜湊先乘上此奇數再取高位元, 使同一個桶中的頂點重新分散
+BUCKET_LEVEL_MULTIPLIER = np.array(0xBF58476D1CE4E5B9, dtype=np.uint64).view(np.int64)
+
+# ASCII STL 整批解析用的轉換表 (solid 與 endsolid 行會先去掉):
+#   m、v、d 只出現在 normal、vertex、endloop/endfacet 中, 依序排列即可檢查每個面的結構
+#   每個面的關鍵字共有 42 個 e 以外的字母與 11 個 e, 多出的字母代表有無法解析的內容
+#   除了指數符號 e/E 以外的字母與空白字元都換成空格, 留下數值
+ASCII_FACET_STRUCTURE = b'mvvvdd'
+ASCII_FACET_LETTERS = 42
+ASCII_FACET_KEYWORD_E = 11
+ASCII_NON_STRUCTURE = bytes(b for b in range(256) if b not in ASCII_FACET_STRUCTURE)
+_ASCII_LETTERS = bytes(b for b in range(128) if chr(b).isalpha() and b not in b'eE')
+ASCII_NON_LETTERS = bytes(b for b in range(256) if b not in _ASCII_LETTERS)
+ASCII_LETTERS_TO_SPACE = bytes.maketrans(_ASCII_LETTERS + b'\t\r\n\x0b\x0c', b' ' * (len(_ASCII_LETTERS) + 5))
+
 class STLConverter:
-    def __init__(self, filename, scale=0.001):  # 新增 scale 參數，預設 0.001 將 mm 轉換為 m
+    def __init__(self, filename, scale=0.001, streaming=False, chunk_size=DEFAULT_CHUNK_SIZE,
+                 weld_tolerance=0.0, obj_precision=None, smooth_normals=False, crease_angle=np.pi / 6,
+                 morton_order=False):  # 新增 scale 參數，預設 0.001 將 mm 轉換為 m
         self.filename = filename
         self.scale = scale
+        # 焊接頂點的容許誤差 (縮放後的單位), 0 表示座標完全相同才視為同一頂點
+        self.weld_tolerance = weld_tolerance
+        # streaming=True 時以記憶體映射逐區塊讀取, 適用於數 GB 的組立檔
+        self.streaming = streaming
+        self.chunk_size = chunk_size
+        # OBJ 座標的有效位數, None 表示完整精度 (與原本的輸出相同), 設定位數可縮小檔案
+        self.obj_precision = obj_precision
+        # smooth_normals=True 時輸出共用的頂點法向量, 夾角大於 crease_angle (弧度, 同 Webots 的 creaseAngle) 的面不互相平滑
+        # 預設維持每個面一個法向量
+        self.smooth_normals = smooth_normals
+        self.crease_angle = crease_angle
+        # morton_order=True 時輸出前把零件的面依重心的 Z-order (Morton) 曲線排序, 頂點隨之依第一次出現的順序編號,
+        # 空間上相鄰的面與頂點在檔案中也相鄰。CAD 匯出的 STL 已依曲面依序排列, 排序反而使壓縮變差,
+        # 只適用於面順序已被打亂的網格 (見 benchmark_morton.py); 預設維持 STL 中的順序
+        self.morton_order = morton_order
+        # split_and_convert 記錄階段耗時時的報告與目前進行中的階段, 不記錄時為 None
+        self._stats = None
+        self._stage_stack = []
         self.is_binary = self._check_if_binary()
         
     def _check_if_binary(self):
@@ -23,31 +151,65 @@ class STLConverter:
             return not header.startswith('solid')
     
     def _read_binary_stl(self):
-        """讀取二進制 STL 檔案"""
+        """讀取二進制 STL 檔案 (以結構化 dtype 一次讀入整個面資料表)"""
         with open(self.filename, 'rb') as f:
             f.seek(80)
-            triangle_count = struct.unpack('I', f.read(4))[0]
+            triangle_count = struct.unpack('<I', f.read(4))[0]
+            facets = np.fromfile(f, dtype=STL_FACET_DTYPE, count=triangle_count)
+        
+        if len(facets) != triangle_count:
+            raise ValueError(f"STL 檔案不完整: 標頭記載 {triangle_count} 個面, 實際只讀到 {len(facets)} 個")
+        
+        # 在讀取頂點時進行縮放 (整個頂點陣列一次相乘)
+        triangles = facets['vertices'].astype(np.float64) * self.scale
+        normals = facets['normal'].astype(np.float64)
+        return triangles, normals
+    
+    def _read_ascii_stl(self):
+        """讀取 ASCII STL 檔案 (整批以位元組運算解析數值, 格式不標準時改用逐行解析)"""
+        with open(self.filename, 'rb') as f:
+            data = f.read()
+        
+        # 去掉第一行的 solid 名稱與結尾的 endsolid, 名稱中可能含有數字或關鍵字
+        body = data[data.find(b'\n') + 1:]
+        end = body.rfind(b'endsolid')
+        if end >= 0:
+            body = body[:end]
+        del data
+        
+        # 先確認每個面的關鍵字順序正確, 才能把所有數值視為 (normal, 3 個 vertex) 的連續序列
+        structure = body.translate(None, ASCII_NON_STRUCTURE)
+        facet_count = len(structure) // len(ASCII_FACET_STRUCTURE)
+        
+        if (structure == ASCII_FACET_STRUCTURE * facet_count
+                and len(body.translate(None, ASCII_NON_LETTERS)) == ASCII_FACET_LETTERS * facet_count):
+            text = np.frombuffer(bytearray(body.translate(ASCII_LETTERS_TO_SPACE)), dtype=np.uint8)
+            del body
+            # 關鍵字留下的 e 前面是空格, 數值中的指數符號則接在數字或小數點之後
+            e_index = np.flatnonzero((text | 0x20) == ord('e'))
+            before = text[np.maximum(e_index - 1, 0)]
+            in_number = ((before >= ord('0')) & (before <= ord('9')) | (before == ord('.'))) & (e_index > 0)
+            keyword_e = e_index[~in_number]
+            text[keyword_e] = ord(' ')
             
-            triangles = []
-            normals = []
+            values = None
+            if len(keyword_e) == ASCII_FACET_KEYWORD_E * facet_count:
+                try:
+                    values = np.fromstring(text.tobytes(), sep=' ')
+                except ValueError:
+                    pass
             
-            for _ in range(triangle_count):
-                nx, ny, nz = struct.unpack('fff', f.read(12))
-                normals.append([nx, ny, nz])
-                
-                triangle = []
-                for _ in range(3):
-                    x, y, z = struct.unpack('fff', f.read(12))
-                    # 在讀取頂點時進行縮放
-                    triangle.append([x * self.scale, y * self.scale, z * self.scale])
-                triangles.append(triangle)
-                
-                f.seek(2, 1)
-                
-        return np.array(triangles), np.array(normals)
+            if values is not None and len(values) == 12 * facet_count:
+                values = values.reshape(-1, 4, 3)
+                normals = values[:, 0].copy()
+                # 在讀取頂點時進行縮放
+                triangles = values[:, 1:] * self.scale
+                return triangles, normals
+        
+        return self._read_ascii_stl_by_line()
     
-    def _read_ascii_stl(self):
-        """讀取 ASCII STL 檔案"""
+    def _read_ascii_stl_by_line(self):
+        """逐行讀取 ASCII STL 檔案 (非標準格式時使用, 也作為比對與效能基準)"""
         triangles = []
         normals = []
         current_triangle = []
@@ -73,62 +235,550 @@ class STLConverter:
                     ])
                 elif parts[0] == 'endfacet':
                     if current_triangle:
+                        if len(current_triangle) != 3:
+                            raise ValueError(f"ASCII STL 第 {len(triangles) + 1} 個面有 {len(current_triangle)} 個頂點")
                         triangles.append(current_triangle)
                         current_triangle = []
         
+        if len(triangles) != len(normals):
+            raise ValueError(f"ASCII STL 面數不一致: {len(normals)} 個 facet normal, {len(triangles)} 個三角形")
+        
         return np.array(triangles), np.array(normals)
     
-    def _split_by_connected_components(self, triangles, normals):
-        """使用連通分量分割模型"""
-        vertex_to_triangle = {}
-        for i, triangle in enumerate(triangles):
-            for vertex in triangle:
-                vertex_tuple = tuple(vertex)
-                if vertex_tuple in vertex_to_triangle:
-                    vertex_to_triangle[vertex_tuple].append(i)
-                else:
-                    vertex_to_triangle[vertex_tuple] = [i]
+    def streaming_memory_ceiling(self, facet_count, vertex_count):
+        """估計串流模式讀取時的峰值記憶體 (bytes)"""
+        return (min(self.chunk_size, facet_count) * STREAM_BYTES_PER_CHUNK_FACET
+                + facet_count * STREAM_BYTES_PER_FACET
+                + vertex_count * STREAM_BYTES_PER_VERTEX)
+    
+    def _binary_facet_count(self):
+        """讀取二進制 STL 標頭記載的面數"""
+        with open(self.filename, 'rb') as f:
+            f.seek(80)
+            return struct.unpack('<I', f.read(4))[0]
+    
+    def _iter_binary_chunks(self):
+        """以記憶體映射逐區塊讀取二進制 STL, 每次回傳 chunk_size 個面的 (頂點, 法向量)"""
+        with open(self.filename, 'rb') as f:
+            f.seek(80)
+            triangle_count = struct.unpack('<I', f.read(4))[0]
+            f.seek(0, 2)
+            available = (f.tell() - 84) // STL_FACET_DTYPE.itemsize
         
-        visited = set()
-        components = []
+        if available < triangle_count:
+            raise ValueError(f"STL 檔案不完整: 標頭記載 {triangle_count} 個面, 實際只讀到 {available} 個")
+        if triangle_count == 0:
+            return
+        
+        facets = np.memmap(self.filename, dtype=STL_FACET_DTYPE, mode='r', offset=84, shape=(triangle_count,))
+        for start in range(0, triangle_count, self.chunk_size):
+            chunk = facets[start:start + self.chunk_size]
+            yield chunk['vertices'], chunk['normal']
+    
+    def _index_vertex_chunks(self, chunks, facet_count):
+        """逐區塊合併相同頂點, 建立唯一頂點表與面索引
         
-        def dfs(triangle_idx):
-            component = []
-            stack = [triangle_idx]
+        頂點依第一次出現的順序編號, 與 _weld_vertices 的結果相同。
+        回傳 (唯一頂點, int32 面索引, float32 法向量)。
+        """
+        faces = np.empty((facet_count, 3), dtype=np.int32)
+        face_normals = np.empty((facet_count, 3), dtype=np.float32)
+        
+        # 已知頂點分成數段各自排序的 (排序鍵, 頂點編號), 每段長度至少是下一段的兩倍;
+        # 新頂點自成一段再與長度相近的段合併, 避免每個區塊都重建整個排序表;
+        # STL 中相鄰的面通常相鄰, 查詢時由最新的段開始
+        runs = []
+        vertex_chunks = []
+        vertex_count = 0
+        start = 0
+        
+        for chunk_triangles, chunk_normals in chunks:
+            count = len(chunk_triangles)
+            face_normals[start:start + count] = chunk_normals
             
-            while stack:
-                current = stack.pop()
-                if current not in visited:
-                    visited.add(current)
-                    component.append(current)
-                    
-                    for vertex in triangles[current]:
-                        vertex_tuple = tuple(vertex)
-                        for neighbor in vertex_to_triangle[vertex_tuple]:
-                            if neighbor not in visited:
-                                stack.append(neighbor)
+            vertices = np.array(chunk_triangles).reshape(-1, 3)
+            keys = self._vertex_keys(vertices, self.scale)
+            unique_keys, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            
+            ids = np.empty(len(unique_keys), dtype=np.int32)
+            is_new = np.ones(len(unique_keys), dtype=bool)
+            for run_keys, run_ids in reversed(runs):
+                pending = np.flatnonzero(is_new)
+                if len(pending) == 0:
+                    break
+                position = np.minimum(np.searchsorted(run_keys, unique_keys[pending]), len(run_keys) - 1)
+                found = run_keys[position] == unique_keys[pending]
+                ids[pending[found]] = run_ids[position[found]]
+                is_new[pending[found]] = False
+            
+            # 新頂點依在區塊中第一次出現的順序編號
+            new_slots = np.flatnonzero(is_new)
+            new_slots = new_slots[np.argsort(first_index[new_slots], kind='stable')]
+            ids[new_slots] = np.arange(vertex_count, vertex_count + len(new_slots), dtype=np.int32)
+            vertex_chunks.append(vertices[first_index[new_slots]])
+            vertex_count += len(new_slots)
+            
+            if is_new.any():
+                runs.append((unique_keys[is_new], ids[is_new]))
+                while len(runs) > 1 and len(runs[-2][0]) < 2 * len(runs[-1][0]):
+                    runs.append(self._merge_sorted_runs(*runs.pop(-2), *runs.pop()))
+            
+            faces[start:start + count] = ids[inverse.ravel()].reshape(-1, 3)
+            start += count
+        
+        del runs
+        if vertex_chunks:
+            vertices = np.concatenate(vertex_chunks)
+        else:
+            vertices = np.empty((0, 3))
+        return vertices, faces, face_normals
+    
+    @staticmethod
+    def _merge_sorted_runs(keys, ids, other_keys, other_ids):
+        """合併兩段各自排序且沒有重複鍵的 (排序鍵, 頂點編號)"""
+        merged_keys = np.empty(len(keys) + len(other_keys), dtype=keys.dtype)
+        merged_ids = np.empty(len(merged_keys), dtype=ids.dtype)
+        # other 的每個鍵在合併後的位置 = 在 keys 中的插入點 + 前面 other 鍵的個數
+        other_at = np.searchsorted(keys, other_keys) + np.arange(len(other_keys))
+        is_other = np.zeros(len(merged_keys), dtype=bool)
+        is_other[other_at] = True
+        merged_keys[other_at] = other_keys
+        merged_ids[other_at] = other_ids
+        merged_keys[~is_other] = keys
+        merged_ids[~is_other] = ids
+        return merged_keys, merged_ids
+    
+    def _read_indexed_stl(self):
+        """串流讀取 STL 並直接建立頂點索引, 不保留完整的三角形陣列"""
+        if self.is_binary:
+            vertices, faces, normals = self._index_vertex_chunks(self._iter_binary_chunks(), self._binary_facet_count())
+            # 縮放只作用在唯一頂點上
+            scaled = vertices.astype(np.float64)
+            scaled *= self.scale
+            return scaled, faces, normals
+        
+        # ASCII 檔無法記憶體映射, 讀入後一次焊接
+        triangles, normals = self._read_ascii_stl()
+        vertices, faces = self._weld_vertices(triangles)
+        return vertices, faces, normals
+    
+    def _vertex_grid(self, vertices, scale=1.0):
+        """把頂點轉成 (n, 3) int64 格點, 格點相同的頂點會被焊接成同一點
+        
+        weld_tolerance 為 0 時使用座標的位元表示 (-0.0 與 0.0 視為相同), 否則使用
+        縮放後座標除以容許誤差再四捨五入的格點。
+        """
+        if self.weld_tolerance > 0:
+            scaled = vertices.astype(np.float64) * scale
+            return np.rint(scaled * (1.0 / self.weld_tolerance)).astype(np.int64)
+        bits = vertices + 0
+        return bits.view(f'i{bits.itemsize}').astype(np.int64, copy=False)
+    
+    def _vertex_keys(self, vertices, scale=1.0):
+        """每個頂點一個可排序的 void 比對鍵, 供串流模式合併區塊時使用"""
+        if self.weld_tolerance > 0:
+            grid = self._vertex_grid(vertices, scale)
+        else:
+            # 完全比對時直接使用原寬度的位元, float32 頂點的鍵只需 12 bytes
+            grid = vertices + 0
+        return grid.view(f'V{grid.itemsize * 3}').ravel()
+    
+    def _weld_vertices(self, triangles):
+        """一次向量化焊接所有頂點, 回傳 (唯一頂點, int32 面索引)
+        
+        頂點依第一次出現的順序編號, 座標取第一次出現時的值。
+        """
+        flat = triangles.reshape(-1, 3)
+        if len(flat) == 0:
+            return flat, np.empty((0, 3), dtype=np.int32)
+        ids, first_index = self._group_vertices(self._vertex_grid(flat))
+        return flat[first_index], ids.reshape(-1, 3)
+    
+    def _group_vertices(self, grid):
+        """把格點相同的列編成同一組, 回傳 (每列的 int32 組別, 每組第一次出現的列)
+        
+        組別依第一次出現的順序編號。
+        """
+        # 以 64 位元雜湊排序比排序整列快得多; 雜湊相同但格點不同時改用 lexsort
+        hashed = grid @ VERTEX_HASH_MULTIPLIERS
+        order = np.argsort(hashed)
+        sorted_grid = np.take(grid, order, axis=0)
+        new_group = np.ones(len(order), dtype=bool)
+        new_group[1:] = np.any(sorted_grid[1:] != sorted_grid[:-1], axis=1)
+        sorted_hash = hashed[order]
+        if np.any(new_group[1:] & (sorted_hash[1:] == sorted_hash[:-1])):
+            order = np.lexsort(grid.T[::-1])
+            sorted_grid = np.take(grid, order, axis=0)
+            new_group[1:] = np.any(sorted_grid[1:] != sorted_grid[:-1], axis=1)
+        del sorted_grid, sorted_hash
+        
+        starts = np.flatnonzero(new_group)
+        first_index = np.minimum.reduceat(order, starts)
+        group = np.cumsum(new_group) - 1
+        
+        rank = np.empty(len(starts), dtype=np.int32)
+        rank[np.argsort(first_index)] = np.arange(len(starts), dtype=np.int32)
+        ids = np.empty(len(order), dtype=np.int32)
+        ids[order] = rank[group]
+        return ids, np.sort(first_index)
+    
+    def _label_vertices(self, faces, vertex_count):
+        """以陣列實作的 union-find 標記頂點所屬的連通分量, 回傳每個頂點的根節點編號
+        
+        每一輪把每條邊兩端的根接到較小的根上, 再以指標跳躍壓縮路徑, 直到所有邊的兩端同根。
+        """
+        parent = np.arange(vertex_count, dtype=np.int32)
+        # 每個三角形用兩條邊即可把三個頂點連在一起
+        u = np.concatenate([faces[:, 0], faces[:, 1]])
+        v = np.concatenate([faces[:, 1], faces[:, 2]])
+        
+        while True:
+            root_u = parent[u]
+            root_v = parent[v]
+            pending = root_u != root_v
+            if not pending.any():
+                return parent
+            u, v = u[pending], v[pending]
+            root_u, root_v = root_u[pending], root_v[pending]
+            parent[np.maximum(root_u, root_v)] = np.minimum(root_u, root_v)
             
-            return component
+            while True:
+                grandparent = parent[parent]
+                if np.array_equal(grandparent, parent):
+                    break
+                parent = grandparent
+    
+    def _split_by_connected_components(self, faces, vertex_count):
+        """使用連通分量分割模型, 回傳每個零件的面編號陣列
         
-        for i in range(len(triangles)):
-            if i not in visited:
-                component = dfs(i)
-                components.append(component)
+        零件依第一個面在 STL 中的位置排序, 零件內的面維持原本的順序。
+        """
+        if len(faces) == 0:
+            return []
         
+        labels = self._label_vertices(faces, vertex_count)[faces[:, 0]]
+        order = np.argsort(labels, kind='stable')
+        boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+        components = np.split(order, boundaries)
+        components.sort(key=lambda component: component[0])
         return components
     
+    def _read_welded_mesh(self):
+        """在記憶體中讀取並焊接整個模型, 回傳 (頂點, 面索引, 法向量)"""
+        if self.streaming:
+            # 串流模式在讀取時同時焊接, 兩者都計入 read 階段
+            with self._stage('read'):
+                vertices, faces, normals = self._read_indexed_stl()
+        else:
+            with self._stage('read'):
+                if self.is_binary:
+                    triangles, normals = self._read_binary_stl()
+                else:
+                    triangles, normals = self._read_ascii_stl()
+            with self._stage('weld'):
+                vertices, faces = self._weld_vertices(triangles)
+            del triangles
+        self._count(facets=len(faces), vertices=len(vertices))
+        return vertices, faces, normals
+    
+    def _iter_in_memory_parts(self):
+        """在記憶體中讀取、焊接與分割, 依序回傳每個零件的 (頂點, 面索引, 法向量)"""
+        vertices, faces, normals = self._read_welded_mesh()
+        
+        # 分割與輸出都使用同一份頂點索引
+        with self._stage('split'):
+            components = self._split_by_connected_components(faces, len(vertices))
+        for component in components:
+            yield vertices, faces[component], normals[component]
+    
+    def iter_components(self, out_of_core=False, work_dir=None):
+        """不寫出任何檔案, 依序回傳每個零件的 (零件編號, 頂點, 面索引, 法向量), 供修復、簡化等後續處理直接使用
+        
+        零件編號從 1 開始, 與 split_and_convert 輸出的 part_N 相同; 頂點為縮放後的 float64,
+        面索引從 0 開始且只指向零件自己的頂點 (依第一次出現的順序, 與輸出的 OBJ 相同)。
+        記憶體內分割時先把頂點、面與法向量依零件重新排列一次, 每個零件都是這些共用陣列的切片 view,
+        不另外複製; 需要修改或在迭代之後保留時請自行 copy()。
+        out_of_core=True 時 (僅限二進制 STL) 每次只從磁碟讀入一個零件。
+        """
+        if out_of_core and self.is_binary:
+            for i, (vertices, faces, normals) in enumerate(self._iter_out_of_core_parts(work_dir)):
+                vertices, faces = self._part_mesh(vertices, faces)
+                yield i + 1, vertices, faces, normals
+            return
+        
+        vertices, faces, normals = self._read_welded_mesh()
+        components = self._split_by_connected_components(faces, len(vertices))
+        if not components:
+            return
+        face_offsets = np.cumsum([0] + [len(component) for component in components])
+        order = np.concatenate(components)
+        del components
+        faces = faces[order]
+        normals = normals[order]
+        del order
+        
+        # 依零件排列後, 頂點依第一次出現的順序重新編號, 每個零件的頂點就成為連續的一段
+        used, first_index, inverse = np.unique(faces.ravel(), return_index=True, return_inverse=True)
+        vertex_order = np.argsort(first_index, kind='stable')
+        del first_index
+        vertices = np.asarray(vertices[used[vertex_order]], dtype=np.float64)
+        rank = np.empty(len(vertex_order), dtype=faces.dtype)
+        rank[vertex_order] = np.arange(len(vertex_order), dtype=faces.dtype)
+        del used, vertex_order
+        faces = rank[inverse.reshape(-1, 3)]
+        del inverse, rank
+        
+        # 零件第一個面的第一個頂點就是該零件的第一個頂點; 改成零件內的編號
+        vertex_offsets = np.append(faces[face_offsets[:-1], 0], len(vertices))
+        faces -= np.repeat(vertex_offsets[:-1], np.diff(face_offsets)).astype(faces.dtype)[:, None]
+        for i in range(len(face_offsets) - 1):
+            face_slice = slice(face_offsets[i], face_offsets[i + 1])
+            yield (i + 1, vertices[vertex_offsets[i]:vertex_offsets[i + 1]], faces[face_slice], normals[face_slice])
+    
+    def _iter_out_of_core_parts(self, work_dir=None):
+        """外部記憶體分割, 依序回傳每個零件的 (頂點, 面索引, 法向量), 結果與記憶體內分割相同
+        
+        1. 逐區塊讀取記憶體映射的 STL, 依頂點格點的空間雜湊把 (格點, 角點編號) 分到磁碟上的桶
+        2. 每個桶各自焊接 (過大的桶先分成子桶), 把頂點編號寫入磁碟上的角點表
+        3. 在磁碟上的 parent 陣列執行 union-find, 依第一個面的位置為零件編號
+        4. 第二次逐區塊讀取, 把每個面寫到依零件排序的暫存檔中對應的位置
+        除了每個區塊的暫存陣列與零件數大小的表之外, 與面數或頂點數成正比的資料都放在磁碟上。
+        """
+        facet_count = self._binary_facet_count()
+        with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+            tmp = Path(tmp)
+            with self._stage('bucket'):
+                corner_vertex, vertex_count = self._bucket_vertex_ids(tmp, facet_count)
+            self._count(facets=facet_count, vertices=vertex_count)
+            with self._stage('label'):
+                parent = self._label_vertices_on_disk(tmp, corner_vertex, vertex_count, facet_count)
+            with self._stage('route'):
+                routed, offsets = self._route_facets(tmp, corner_vertex, parent, facet_count)
+            del corner_vertex, parent
+            
+            for start, end in zip(offsets[:-1], offsets[1:], strict=True):
+                records = np.array(routed[start:end])
+                _, first_index, inverse = np.unique(records['ids'].ravel(), return_index=True, return_inverse=True)
+                vertices = records['vertices'].reshape(-1, 3)[first_index].astype(np.float64) * self.scale
+                faces = inverse.reshape(-1, 3).astype(np.int32)
+                yield vertices, faces, records['normal'].astype(np.float64)
+            del routed
+    
+    def _bucket_vertex_ids(self, tmp, facet_count):
+        """第一階段: 依空間雜湊分桶後逐桶焊接, 回傳磁碟上的角點頂點編號表與頂點數"""
+        def chunk_records():
+            start = 0
+            for chunk_vertices, _ in self._iter_binary_chunks():
+                grid = self._vertex_grid(np.array(chunk_vertices).reshape(-1, 3), self.scale)
+                records = np.empty(len(grid), dtype=BUCKET_RECORD_DTYPE)
+                records['grid'] = grid
+                records['corner'] = np.arange(3 * start, 3 * start + len(grid))
+                yield records
+                start += len(chunk_vertices)
+        
+        bucket_count = min(max(1, -(-facet_count // self.chunk_size)), MAX_OPEN_BUCKETS)
+        bucket_paths = self._scatter_buckets(chunk_records(), tmp / "bucket", bucket_count, 0)
+        
+        corner_vertex = np.memmap(tmp / "corner_vertex.bin", dtype=np.int32, mode='w+', shape=(max(3 * facet_count, 1),))
+        vertex_count = 0
+        for path in bucket_paths:
+            vertex_count = self._weld_bucket(path, 1, corner_vertex, vertex_count)
+        return corner_vertex, vertex_count
+    
+    def _scatter_buckets(self, record_chunks, prefix, bucket_count, level):
+        """把每批 BUCKET_RECORD_DTYPE 紀錄依第 level 層的雜湊附加到 bucket_count 個桶檔, 回傳桶檔路徑"""
+        bucket_paths = [prefix.with_name(f"{prefix.name}_{b}.bin") for b in range(bucket_count)]
+        bucket_files = [open(path, 'wb') for path in bucket_paths]
+        try:
+            for records in record_chunks:
+                key = records['grid'] @ VERTEX_HASH_MULTIPLIERS
+                for _ in range(level):
+                    key = key * BUCKET_LEVEL_MULTIPLIER
+                # 格點相同的頂點一定落在同一個桶
+                bucket = (key >> 33) % bucket_count
+                order = np.argsort(bucket, kind='stable')
+                bounds = np.searchsorted(bucket[order], np.arange(bucket_count + 1))
+                for b in range(bucket_count):
+                    if bounds[b] < bounds[b + 1]:
+                        bucket_files[b].write(records[order[bounds[b]:bounds[b + 1]]].tobytes())
+        finally:
+            for f in bucket_files:
+                f.close()
+        return bucket_paths
+    
+    def _weld_bucket(self, path, level, corner_vertex, vertex_count):
+        """焊接一個桶並刪除桶檔, 頂點從 vertex_count 開始編號, 回傳新的頂點總數
+        
+        桶中超過 3 * chunk_size 個角點時 (模型很大或雜湊不均) 先分成子桶, 每次只讀入一個區塊。
+        """
+        record_count = os.path.getsize(path) // BUCKET_RECORD_DTYPE.itemsize
+        if record_count > 3 * self.chunk_size and level < BUCKET_LEVELS:
+            block = 3 * self.chunk_size
+            stored = np.memmap(path, dtype=BUCKET_RECORD_DTYPE, mode='r')
+            sub_paths = self._scatter_buckets((np.array(stored[start:start + block])
+                                               for start in range(0, record_count, block)),
+                                              path.with_suffix(''), min(-(-record_count // block), MAX_OPEN_BUCKETS), level)
+            del stored
+            os.remove(path)
+            for sub_path in sub_paths:
+                vertex_count = self._weld_bucket(sub_path, level + 1, corner_vertex, vertex_count)
+            return vertex_count
+        
+        records = np.fromfile(path, dtype=BUCKET_RECORD_DTYPE)
+        os.remove(path)
+        if len(records) == 0:
+            return vertex_count
+        ids, first_index = self._group_vertices(records['grid'])
+        corner_vertex[records['corner']] = ids + vertex_count
+        return vertex_count + len(first_index)
+    
+    def _find_roots(self, parent, nodes):
+        """沿 parent 指標找到每個節點的根, 並把 nodes 直接指向找到的根 (路徑壓縮)"""
+        roots = parent[nodes]
+        while True:
+            next_roots = parent[roots]
+            if np.array_equal(next_roots, roots):
+                break
+            roots = next_roots
+        parent[nodes] = roots
+        return roots
+    
+    def _jump_pointers(self, parent, nodes):
+        """指標跳躍: 反覆把 nodes 指向 parent 的 parent, 直到都指向根
+        
+        nodes 包含鏈上所有的非根節點時 (例如一個區塊剛接上的根), 每一輪鏈長減半, 只需 O(log 鏈長) 輪。
+        """
+        while True:
+            targets = parent[nodes]
+            next_targets = parent[targets]
+            if np.array_equal(next_targets, targets):
+                return
+            parent[nodes] = next_targets
+    
+    def _label_vertices_on_disk(self, tmp, corner_vertex, vertex_count, facet_count):
+        """第二階段: 在磁碟上的 parent 陣列逐區塊執行 union-find, 結束時每個頂點都直接指向根
+        
+        parent 永遠指向編號較小的頂點, 因此依編號由小到大逐區塊做指標跳躍時, 區塊之前的頂點都已指向根,
+        一次掃描即可壓縮全部路徑; 每個區塊接上的根也立刻做指標跳躍, 長條形的零件才不會留下很長的鏈。
+        """
+        parent = np.memmap(tmp / "parent.bin", dtype=np.int32, mode='w+', shape=(max(vertex_count, 1),))
+        for start in range(0, vertex_count, self.chunk_size):
+            end = min(start + self.chunk_size, vertex_count)
+            parent[start:end] = np.arange(start, end, dtype=np.int32)
+        
+        while True:
+            # 只把根接到較小的根上, 同一輪中互相覆蓋的邊會在下一輪重新處理
+            hooked = 0
+            for start in range(0, facet_count, self.chunk_size):
+                corners = np.array(corner_vertex[3 * start:3 * min(start + self.chunk_size, facet_count)]).reshape(-1, 3)
+                root_u = self._find_roots(parent, np.concatenate([corners[:, 0], corners[:, 1]]))
+                root_v = self._find_roots(parent, np.concatenate([corners[:, 1], corners[:, 2]]))
+                pending = root_u != root_v
+                if pending.any():
+                    children = np.maximum(root_u[pending], root_v[pending])
+                    parent[children] = np.minimum(root_u[pending], root_v[pending])
+                    self._jump_pointers(parent, children)
+                    hooked += int(pending.sum())
+            
+            for start in range(0, vertex_count, self.chunk_size):
+                self._jump_pointers(parent, np.arange(start, min(start + self.chunk_size, vertex_count)))
+            
+            if hooked == 0:
+                return parent
+    
+    def _route_facets(self, tmp, corner_vertex, parent, facet_count):
+        """第三階段: 依第一個面的位置為零件編號, 再逐區塊把每個面寫到所屬零件的位置
+        
+        回傳依零件排序的面資料 (memmap) 與每個零件的起訖位置。
+        """
+        def chunk_roots(start, end):
+            return parent[corner_vertex[3 * start:3 * end:3]]
+        
+        first_face = np.memmap(tmp / "first_face.bin", dtype=np.int64, mode='w+', shape=(len(parent),))
+        first_face[:] = facet_count
+        for start in range(0, facet_count, self.chunk_size):
+            end = min(start + self.chunk_size, facet_count)
+            np.minimum.at(first_face, chunk_roots(start, end), np.arange(start, end))
+        
+        roots = []
+        for start in range(0, len(parent), self.chunk_size):
+            block = np.array(first_face[start:start + self.chunk_size])
+            roots.append(start + np.flatnonzero(block < facet_count))
+        roots = np.concatenate(roots)
+        roots = roots[np.argsort(first_face[roots])]
+        del first_face
+        
+        part_of_root = np.memmap(tmp / "part_of_root.bin", dtype=np.int32, mode='w+', shape=(len(parent),))
+        part_of_root[roots] = np.arange(len(roots), dtype=np.int32)
+        part_count = len(roots)
+        
+        counts = np.zeros(part_count, dtype=np.int64)
+        for start in range(0, facet_count, self.chunk_size):
+            end = min(start + self.chunk_size, facet_count)
+            counts += np.bincount(part_of_root[chunk_roots(start, end)], minlength=part_count)
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        
+        routed = np.memmap(tmp / "routed.bin", dtype=ROUTED_FACET_DTYPE, mode='w+', shape=(max(facet_count, 1),))
+        cursor = offsets[:-1].copy()
+        start = 0
+        for chunk_vertices, chunk_normals in self._iter_binary_chunks():
+            end = start + len(chunk_vertices)
+            parts = part_of_root[chunk_roots(start, end)]
+            order = np.argsort(parts, kind='stable')
+            sorted_parts = parts[order]
+            # 區塊內同一零件的面維持原本的先後順序
+            rank = np.arange(len(order)) - np.searchsorted(sorted_parts, sorted_parts)
+            
+            records = np.empty(len(order), dtype=ROUTED_FACET_DTYPE)
+            records['normal'] = chunk_normals[order]
+            records['vertices'] = chunk_vertices[order]
+            records['ids'] = np.array(corner_vertex[3 * start:3 * end]).reshape(-1, 3)[order]
+            routed[cursor[sorted_parts] + rank] = records
+            cursor += np.bincount(parts, minlength=part_count)
+            start = end
+        
+        return routed, offsets
+    
     def _write_binary_stl(self, filename, triangles, normals):
-        """寫入二進制 STL 檔案"""
+        """寫入二進制 STL 檔案
+        
+        在同一塊緩衝區中填好 84 bytes 的標頭與 STL_FACET_DTYPE 的面資料, 整個檔案只寫入一次。
+        """
+        buffer = np.zeros(84 + STL_FACET_DTYPE.itemsize * len(triangles), dtype=np.uint8)
+        buffer[80:84] = np.frombuffer(struct.pack('<I', len(triangles)), dtype=np.uint8)
+        facets = buffer[84:].view(STL_FACET_DTYPE)
+        facets['normal'] = normals
+        facets['vertices'] = triangles
         with open(filename, 'wb') as f:
-            f.write(b'\x00' * 80)
-            f.write(struct.pack('I', len(triangles)))
-            
-            for triangle, normal in zip(triangles, normals):
-                f.write(struct.pack('fff', *normal))
-                for vertex in triangle:
-                    f.write(struct.pack('fff', *vertex))
-                f.write(struct.pack('H', 0))
+            f.write(buffer)
 
+    def _write_ply(self, filename, vertices, faces):
+        """寫入二進制 little-endian PLY 檔案 (float32 頂點與 int32 面索引, 不含法向量)"""
+        vertices, corners = self._part_mesh(vertices, faces)
+        records = np.empty(len(corners), dtype=PLY_FACE_DTYPE)
+        records['count'] = 3
+        records['indices'] = corners
+        header = (
+            "ply\n"
+            "format binary_little_endian 1.0\n"
+            f"element vertex {len(vertices)}\n"
+            "property float x\n"
+            "property float y\n"
+            "property float z\n"
+            f"element face {len(records)}\n"
+            "property list uchar int vertex_indices\n"
+            "end_header\n"
+        )
+        with open(filename, 'wb') as f:
+            f.write(header.encode('ascii'))
+            f.write(vertices.astype('<f4'))
+            f.write(records)
+    
+    def _write_qmesh(self, filename, vertices, faces, normals):
+        """寫入只包含這個零件的量化網格容器 (見 write_quantized_mesh)"""
+        vertices, corners = self._part_mesh(vertices, faces)
+        write_quantized_mesh(filename, [(filename.stem, vertices, corners, normals)])
+    
     def _write_mtl(self, filename, material_name):
         """寫入 MTL 材質檔案"""
         with open(filename, 'w', encoding='utf-8') as f:
@@ -140,25 +790,90 @@ class STLConverter:
             f.write("d 1.0\n")           # Transparency (1.0 = opaque)
             f.write("illum 2\n")         # Illumination model
 
-    def _write_obj(self, filename, triangles, normals):
-        """寫入 OBJ 檔案"""
-        vertex_dict = {}
-        vertex_list = []
-        normal_list = []
-        faces = []
+    def _write_rows(self, f, template, rows):
+        """每 OBJ_WRITE_CHUNK_ROWS 列以一次字串格式化產生整塊文字再寫入, 每列套用一次 template"""
+        for start in range(0, len(rows), OBJ_WRITE_CHUNK_ROWS):
+            chunk = rows[start:start + OBJ_WRITE_CHUNK_ROWS]
+            f.write(template * len(chunk) % tuple(chunk.ravel().tolist()))
+    
+    def _part_mesh(self, vertices, faces):
+        """取出零件自己的頂點表, 回傳 (float64 頂點, 從 0 開始的面索引)
         
-        for triangle, normal in zip(triangles, normals):
-            face_indices = []
-            
-            for vertex in triangle:
-                vertex_tuple = tuple(vertex)
-                if vertex_tuple not in vertex_dict:
-                    vertex_dict[vertex_tuple] = len(vertex_list) + 1
-                    vertex_list.append(vertex)
-                face_indices.append(vertex_dict[vertex_tuple])
-            
-            normal_list.append(normal)
-            faces.append(face_indices)
+        零件內的頂點依第一次出現的順序重新編號。
+        """
+        used, first_index, inverse = np.unique(faces.ravel(), return_index=True, return_inverse=True)
+        order = np.argsort(first_index, kind='stable')
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        return np.asarray(vertices[used[order]], dtype=np.float64), rank[inverse.ravel()].reshape(-1, 3)
+    
+    def _vertex_normals(self, vertices, corners, face_normals):
+        """計算共用的頂點法向量, 回傳 (去重後的法向量表, 每個角點的法向量編號)
+        
+        角點的法向量為共用該頂點、且與本面夾角不超過 crease_angle 的面法向量以面積加權的平均;
+        面積為零的退化面沿用 STL 記錄的法向量。
+        """
+        weighted = np.cross(vertices[corners[:, 1]] - vertices[corners[:, 0]],
+                            vertices[corners[:, 2]] - vertices[corners[:, 0]])
+        area = np.linalg.norm(weighted, axis=1, keepdims=True)
+        unit = np.divide(weighted, area, out=np.zeros_like(weighted), where=area > 0)
+        
+        # 共用同一頂點的所有角點對 (包含自己), 每個頂點的組合數為其相鄰面數的平方;
+        # 依頂點排序後, 第 k 對落在 pair_end 中第一個大於 k 的頂點, 以 NORMAL_PAIR_CHUNK 對為一批處理
+        corner_vertex = corners.ravel()
+        order = np.argsort(corner_vertex, kind='stable')
+        sorted_vertex = corner_vertex[order]
+        starts = np.flatnonzero(np.r_[True, sorted_vertex[1:] != sorted_vertex[:-1]])
+        counts = np.diff(np.r_[starts, len(order)])
+        dense = counts > NORMAL_DENSE_VALENCE
+        pairs = np.where(dense, 0, counts ** 2)
+        pair_end = np.cumsum(pairs)
+        pair_count = int(pair_end[-1]) if len(pair_end) else 0
+        cos_crease = np.cos(self.crease_angle)
+        sorted_summed = np.zeros((len(order), 3))
+        for begin in range(0, pair_count, NORMAL_PAIR_CHUNK):
+            pair = np.arange(begin, min(begin + NORMAL_PAIR_CHUNK, pair_count))
+            vertex = np.searchsorted(pair_end, pair, side='right')
+            offset = pair - (pair_end[vertex] - pairs[vertex])
+            # 左角點在排序後的位置隨 pair 遞增, 只累加到這一批涵蓋的範圍
+            left = starts[vertex] + offset // counts[vertex]
+            right = order[starts[vertex] + offset % counts[vertex]]
+            first = left[0]
+            keep = np.einsum('ij,ij->i', unit[order[left] // 3], unit[right // 3]) >= cos_crease
+            left, right = left[keep] - first, right[keep]
+            for axis in range(3):
+                sums = np.bincount(left, weights=weighted[right // 3, axis])
+                sorted_summed[first:first + len(sums), axis] += sums
+        
+        # 高相鄰面數的頂點: 角點對的夾角判斷成為矩陣, 同樣每批不超過 NORMAL_PAIR_CHUNK 對
+        for start, count in zip(starts[dense], counts[dense], strict=True):
+            members = order[start:start + count] // 3
+            rows = max(NORMAL_PAIR_CHUNK // count, 1)
+            for row in range(0, count, rows):
+                block = members[row:row + rows]
+                smooth = unit[block] @ unit[members].T >= cos_crease
+                sorted_summed[start + row:start + row + len(block)] = smooth.astype(np.float64) @ weighted[members]
+        summed = np.empty_like(sorted_summed)
+        summed[order] = sorted_summed
+        length = np.linalg.norm(summed, axis=1, keepdims=True)
+        fallback = np.repeat(np.asarray(face_normals, dtype=np.float64), 3, axis=0)
+        corner_normals = np.where(length > 0, summed / np.where(length > 0, length, 1.0), fallback)
+        
+        ids, first_index = self._group_vertices(np.rint(corner_normals / NORMAL_WELD_TOLERANCE).astype(np.int64))
+        return corner_normals[first_index], ids.reshape(-1, 3)
+    
+    def _write_obj(self, filename, vertices, faces, normals):
+        """寫入 OBJ 檔案 (faces 為零件的面在共用頂點表中的編號)"""
+        vertices, corners = self._part_mesh(vertices, faces)
+        if self.smooth_normals:
+            normals, corner_normals = self._vertex_normals(vertices, corners, normals)
+        else:
+            corner_normals = np.repeat(np.arange(len(corners))[:, None], 3, axis=1)
+        
+        # OBJ 的編號從 1 開始
+        face_rows = np.stack([corners + 1, corner_normals + 1], axis=2).reshape(-1, 6)
+        
+        number = '%r' if self.obj_precision is None else f'%.{self.obj_precision}g'
         
         # Generate material name from the obj filename
         material_name = filename.stem
@@ -171,57 +886,1027 @@ class STLConverter:
             f.write(f"mtllib {mtl_filename.name}\n")
             f.write(f"usemtl {material_name}\n\n")
             
-            for v in vertex_list:
-                f.write(f"v {v[0]} {v[1]} {v[2]}\n")
-            
-            for n in normal_list:
-                f.write(f"vn {n[0]} {n[1]} {n[2]}\n")
-            
-            for i, face in enumerate(faces):
-                f.write(f"f {face[0]}//{i+1} {face[1]}//{i+1} {face[2]}//{i+1}\n")
+            self._write_rows(f, f"v {number} {number} {number}\n", vertices)
+            self._write_rows(f, f"vn {number} {number} {number}\n", np.asarray(normals, dtype=np.float64))
+            self._write_rows(f, "f %d//%d %d//%d %d//%d\n", face_rows)
         
         # Write the corresponding MTL file
         self._write_mtl(mtl_filename, material_name)
     
-    def split_and_convert(self):
-        """分割 STL 檔案並轉換為 OBJ 格式"""
-        if self.is_binary:
-            triangles, normals = self._read_binary_stl()
+    def _shape_fingerprint(self, vertices, corners):
+        """與位置、方向無關的形狀特徵, 回傳 (頂點數, 面數, 表面積, 由小到大的二階矩), 以及重心與主軸"""
+        centroid = vertices.mean(axis=0)
+        centered = vertices - centroid
+        moments, axes = np.linalg.eigh(centered.T @ centered / len(vertices))
+        area = 0.5 * np.linalg.norm(np.cross(vertices[corners[:, 1]] - vertices[corners[:, 0]],
+                                             vertices[corners[:, 2]] - vertices[corners[:, 0]]), axis=1).sum()
+        return (len(vertices), len(corners), area, moments), centroid, axes
+    
+    def _same_fingerprint(self, a, b):
+        return a[:2] == b[:2] and np.allclose(np.r_[a[2], a[3]], np.r_[b[2], b[3]], rtol=1e-4, atol=0)
+    
+    def _covers(self, moved, target, tolerance):
+        """檢查 moved 的每個頂點附近 (約 tolerance 內) 都有 target 的頂點
+        
+        target 依邊長 2 * tolerance 的格點雜湊排序, moved 的每個頂點搜尋周圍 27 個格子。
+        """
+        cell = 2 * tolerance
+        target_keys = np.sort(np.rint(target / cell).astype(np.int64) @ VERTEX_HASH_MULTIPLIERS)
+        moved_cells = np.rint(moved / cell).astype(np.int64)
+        found = np.zeros(len(moved), dtype=bool)
+        for offset in np.stack(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1]), axis=-1).reshape(-1, 3):
+            keys = (moved_cells + offset) @ VERTEX_HASH_MULTIPLIERS
+            position = np.minimum(np.searchsorted(target_keys, keys), len(target_keys) - 1)
+            found |= target_keys[position] == keys
+        return found.all()
+    
+    def _rigid_alignment(self, source, target, source_frame, target_frame):
+        """尋找把 source 的頂點移到 target 的剛體變換 (R, t), 使 target ≈ source @ R.T + t, 找不到時回傳 None
+        
+        先假設兩者的頂點順序一致, 以 Kabsch 法求最佳旋轉 (同一個 CAD 零件的複本通常如此);
+        否則依兩者的主軸嘗試 4 種不含鏡像的對應方式。主軸不唯一 (如軸對稱零件) 時可能找不到,
+        該零件就照常輸出完整的網格。
+        """
+        tolerance = INSTANCE_TOLERANCE * max(np.abs(source).max(), np.abs(target).max(), 1e-12)
+        
+        source_centroid, target_centroid = source_frame[0], target_frame[0]
+        u, _, vt = np.linalg.svd((source - source_centroid).T @ (target - target_centroid))
+        d = np.sign(np.linalg.det(vt.T @ u.T))
+        rotation = vt.T @ np.diag([1.0, 1.0, d]) @ u.T
+        translation = target_centroid - rotation @ source_centroid
+        if np.abs(source @ rotation.T + translation - target).max() <= tolerance:
+            return rotation, translation
+        
+        source_axes, target_axes = source_frame[1], target_frame[1]
+        for signs in ([1, 1, 1], [1, -1, -1], [-1, 1, -1], [-1, -1, 1]):
+            rotation = target_axes @ np.diag(signs) @ source_axes.T
+            if np.linalg.det(rotation) < 0:
+                rotation = target_axes @ np.diag(np.negative(signs)) @ source_axes.T
+            translation = target_centroid - rotation @ source_centroid
+            moved = source @ rotation.T + translation
+            if self._covers(moved, target, tolerance) and self._covers(target, moved, tolerance):
+                return rotation, translation
+        return None
+    
+    def _axis_angle(self, rotation):
+        """旋轉矩陣轉為 Webots 的 rotation 欄位 (x, y, z, angle)"""
+        angle = np.arccos(np.clip((np.trace(rotation) - 1) / 2, -1.0, 1.0))
+        if angle < 1e-9:
+            return [0.0, 0.0, 1.0, 0.0]
+        if np.pi - angle < 1e-6:
+            axis = np.sqrt(np.maximum((np.diag(rotation) + 1) / 2, 0))
+            # 以最大的分量決定其他分量的正負號
+            k = np.argmax(axis)
+            axis = np.where(rotation[k] < 0, -axis, axis)
+            axis[k] = abs(axis[k])
         else:
-            triangles, normals = self._read_ascii_stl()
+            axis = np.array([rotation[2, 1] - rotation[1, 2], rotation[0, 2] - rotation[2, 0], rotation[1, 0] - rotation[0, 1]])
+        axis = axis / np.linalg.norm(axis)
+        return [float(axis[0]), float(axis[1]), float(axis[2]), float(angle)]
+    
+    def _instance_parts(self, jobs, instances):
+        """找出形狀相同的零件, 只回傳需要輸出網格的零件
+        
+        每個零件的實例資訊依序加入 instances: 使用的網格與把該網格移到零件位置的變換。
+        """
+        shapes = []
+        for part_number, base_filename, vertices, faces, normals in jobs:
+            vertices, corners = self._part_mesh(vertices, faces)
+            fingerprint, centroid, axes = self._shape_fingerprint(vertices, corners)
+            for shape_fingerprint, shape_frame, shape_vertices, shape_filename in shapes:
+                if not self._same_fingerprint(fingerprint, shape_fingerprint):
+                    continue
+                alignment = self._rigid_alignment(shape_vertices, vertices, shape_frame, (centroid, axes))
+                if alignment is not None:
+                    rotation, translation = alignment
+                    break
+            else:
+                shapes.append((fingerprint, (centroid, axes), vertices, base_filename))
+                shape_filename, rotation, translation = base_filename, np.eye(3), np.zeros(3)
+                yield part_number, base_filename, vertices, corners, normals
+            
+            instances.append({
+                'part': part_number,
+                'mesh': shape_filename.name,
+                'rotation_matrix': rotation.tolist(),
+                'rotation': self._axis_angle(rotation),
+                'translation': translation.tolist(),
+            })
+    
+    def _mass_properties(self, vertices, corners, density):
+        """以散度定理計算零件的體積、質心與對質心的慣性張量 (SI 單位, 密度 kg/m^3)
+        
+        每個面與參考點組成一個帶正負號的四面體, 以向量化方式加總其體積、一階矩與二階矩;
+        參考點取頂點平均以減少相消誤差。法向量朝內 (體積為負) 時整體反號。
+        """
+        reference = vertices.mean(axis=0)
+        a, b, c = (vertices[corners[:, k]] - reference for k in range(3))
+        volumes = np.einsum('ij,ij->i', a, np.cross(b, c)) / 6.0
+        total = a + b + c
+        volume = volumes.sum()
+        first_moment = (volumes[:, None] * total).sum(axis=0) / 4.0
+        # 頂點在原點的四面體: ∫ r r^T dV = V / 20 * (a a^T + b b^T + c c^T + s s^T), s = a + b + c
+        second_moment = np.einsum('i,ij,ik->jk', volumes / 20.0, a, a)
+        second_moment += np.einsum('i,ij,ik->jk', volumes / 20.0, b, b)
+        second_moment += np.einsum('i,ij,ik->jk', volumes / 20.0, c, c)
+        second_moment += np.einsum('i,ij,ik->jk', volumes / 20.0, total, total)
+        if volume < 0:
+            volume, first_moment, second_moment = -volume, -first_moment, -second_moment
+        
+        center = first_moment / volume if volume > 0 else np.zeros(3)
+        central = second_moment - volume * np.outer(center, center)
+        inertia = density * (np.trace(central) * np.eye(3) - central)
         
-        components = self._split_by_connected_components(triangles, normals)
+        # 封閉網格的每條有向邊都有等量的反向邊, 否則體積沒有意義 (允許多個面共用一條邊)
+        edges = np.concatenate([corners[:, [0, 1]], corners[:, [1, 2]], corners[:, [2, 0]]])
+        forward, forward_counts = np.unique(edges, axis=0, return_counts=True)
+        backward, backward_counts = np.unique(edges[:, ::-1], axis=0, return_counts=True)
+        closed = np.array_equal(forward, backward) and np.array_equal(forward_counts, backward_counts)
+        return {
+            'volume': float(volume),
+            'mass': float(density * volume),
+            'center_of_mass': (center + reference).tolist(),
+            'inertia_tensor': inertia.tolist(),
+            'closed': bool(closed),
+        }
+    
+    def _collect_mass_properties(self, jobs, records, density):
+        """計算每個零件的質量性質並加入 records, 零件原樣傳下去輸出"""
+        for job in jobs:
+            part_number, base_filename, vertices, faces, normals = job
+            properties = self._mass_properties(*self._part_mesh(vertices, faces), density)
+            if not properties['closed']:
+                print(f"警告: 零件 {part_number} 不是封閉網格, 質量性質可能不正確")
+            inertia = properties['inertia_tensor']
+            records.append({
+                'part': part_number,
+                **properties,
+                # Webots Physics 節點的欄位 (density 為 -1 表示直接使用 mass)
+                'webots_physics': {
+                    'density': -1,
+                    'mass': properties['mass'],
+                    'centerOfMass': [properties['center_of_mass']],
+                    'inertiaMatrix': [
+                        [inertia[0][0], inertia[1][1], inertia[2][2]],
+                        [inertia[0][1], inertia[0][2], inertia[1][2]],
+                    ],
+                },
+            })
+            yield job
+    
+    def _bounding_primitives(self, vertices):
+        """以向量化方式擬合 AABB、PCA 方向的 OBB、外接球與膠囊, 回傳 {名稱: (體積, 參數)}
+        
+        參數中的 rotation 為旋轉矩陣, 各欄為基本形狀的局部座標軸在零件座標中的方向。
+        """
+        lower, upper = vertices.min(axis=0), vertices.max(axis=0)
+        primitives = {
+            'aabb': (float(np.prod(upper - lower)), {'center': (lower + upper) / 2, 'rotation': np.eye(3), 'size': upper - lower}),
+        }
+        
+        # 主軸由短到長, 第三軸取外積使座標系為右手系
+        centroid = vertices.mean(axis=0)
+        _, axes = np.linalg.eigh(np.cov((vertices - centroid).T) if len(vertices) > 1 else np.eye(3))
+        axes[:, 2] = np.cross(axes[:, 0], axes[:, 1])
+        local = (vertices - centroid) @ axes
+        local_lower, local_upper = local.min(axis=0), local.max(axis=0)
+        center = centroid + axes @ ((local_lower + local_upper) / 2)
+        primitives['obb'] = (float(np.prod(local_upper - local_lower)),
+                             {'center': center, 'rotation': axes, 'size': local_upper - local_lower})
+        
+        # 外接球: 從 AABB 中心出發, 每次往最遠點移動一小步 (Badoiu-Clarkson), 保留半徑最小的球
+        sphere_center = (lower + upper) / 2
+        best_center, best_radius = sphere_center, np.inf
+        for step in range(1, 101):
+            distance = np.linalg.norm(vertices - sphere_center, axis=1)
+            farthest = np.argmax(distance)
+            if distance[farthest] < best_radius:
+                best_center, best_radius = sphere_center, distance[farthest]
+            sphere_center = sphere_center + (vertices[farthest] - sphere_center) / (step + 1)
+        primitives['sphere'] = (float(4 / 3 * np.pi * best_radius ** 3), {'center': best_center, 'radius': best_radius})
+        
+        # 膠囊: 沿最長主軸, 半徑為到軸的最大距離, 兩端的半球剛好包住所有頂點
+        radial = local[:, :2] - (local_lower[:2] + local_upper[:2]) / 2
+        radius = np.linalg.norm(radial, axis=1).max()
+        reach = np.sqrt(np.maximum(radius ** 2 - (radial ** 2).sum(axis=1), 0))
+        top, bottom = (local[:, 2] - reach).max(), (local[:, 2] + reach).min()
+        # top <= bottom 時高度為 0, 球心須落在 [top, bottom] 內才包得住所有頂點, 取中點兩種情況都成立
+        middle = (top + bottom) / 2
+        height = max(top - bottom, 0.0)
+        capsule_center = centroid + axes @ np.r_[(local_lower[:2] + local_upper[:2]) / 2, middle]
+        primitives['capsule'] = (float(np.pi * radius ** 2 * height + 4 / 3 * np.pi * radius ** 3),
+                                 {'center': capsule_center, 'rotation': axes, 'radius': radius, 'height': height})
+        return primitives
+    
+    def _webots_bounding_object(self, name, parameters):
+        """產生可直接貼到 Webots boundingObject 欄位的 Pose 節點"""
+        def numbers(values):
+            return ' '.join(f"{v:.6g}" for v in values)
         
-        output_dir = Path('split_parts')
+        lines = ["Pose {", f"  translation {numbers(parameters['center'])}"]
+        if 'rotation' in parameters:
+            rotation = self._axis_angle(parameters['rotation'])
+            if rotation[3] != 0.0:
+                lines.append(f"  rotation {numbers(rotation)}")
+        lines.append("  children [")
+        if name in ('aabb', 'obb'):
+            lines += ["    Box {", f"      size {numbers(parameters['size'])}", "    }"]
+        elif name == 'sphere':
+            lines += ["    Sphere {", f"      radius {parameters['radius']:.6g}", "    }"]
+        else:
+            lines += ["    Capsule {", f"      height {parameters['height']:.6g}", f"      radius {parameters['radius']:.6g}", "    }"]
+        lines += ["  ]", "}"]
+        return '\n'.join(lines)
+    
+    def _collect_bounding_primitives(self, jobs, records):
+        """為每個零件選出體積最小的基本形狀並加入 records, 零件原樣傳下去輸出"""
+        for job in jobs:
+            part_number, base_filename, vertices, faces, normals = job
+            vertices, corners = self._part_mesh(vertices, faces)
+            primitives = self._bounding_primitives(vertices)
+            name = min(primitives, key=lambda k: primitives[k][0])
+            volume, parameters = primitives[name]
+            mesh_volume = abs(self._mass_properties(vertices, corners, 1.0)['volume'])
+            records.append({
+                'part': part_number,
+                'primitive': name,
+                'volume': volume,
+                'mesh_volume': mesh_volume,
+                # 基本形狀與網格的體積比, 越接近 1 越貼合
+                'volume_ratio': volume / mesh_volume if mesh_volume > 0 else None,
+                'candidates': {k: v[0] for k, v in primitives.items()},
+                'webots': self._webots_bounding_object(name, parameters),
+            })
+            yield job
+    
+    def _facet_digest(self, vertices, corners, normals):
+        """與面的順序及各面起始角點無關的內容雜湊
+        
+        每個面輪轉成由字典序最小的角點開始 (保持繞向), 連同法向量排序後再雜湊,
+        因此重新匯出時面的順序改變不會被當成修改。
+        """
+        triangles = vertices[corners]
+        points = triangles.reshape(-1, 3)
+        rank = np.empty(len(points), dtype=np.int64)
+        rank[np.lexsort(points.T[::-1])] = np.arange(len(points))
+        first = rank.reshape(-1, 3).argmin(axis=1)
+        rotated = triangles[np.arange(len(triangles))[:, None], (first[:, None] + np.arange(3)) % 3]
+        # + 0.0 把 -0.0 轉成 0.0, 數值相同的面位元組也相同
+        facets = np.concatenate([rotated.reshape(-1, 9), np.asarray(normals, dtype=np.float64)], axis=1) + 0.0
+        facets = facets[np.lexsort(facets.T[::-1])]
+        return hashlib.sha256(np.ascontiguousarray(facets).tobytes()).hexdigest()
+    
+    def _part_record(self, vertices, faces, normals):
+        """零件的內容雜湊與位置大小, 用於下次增量分割時辨識零件"""
+        vertices, corners = self._part_mesh(vertices, faces)
+        return {
+            'digest': self._facet_digest(vertices, corners, normals),
+            'centroid': vertices.mean(axis=0).tolist(),
+            'diagonal': float(np.linalg.norm(vertices.max(axis=0) - vertices.min(axis=0))),
+        }
+    
+    def _collect_part_records(self, jobs, records):
+        """記錄每個零件的 _part_record 並加入 records, 零件原樣傳下去輸出"""
+        for job in jobs:
+            part_number, base_filename, vertices, faces, normals = job
+            records.append({'part': part_number, **self._part_record(vertices, faces, normals)})
+            yield job
+    
+    def _match_previous_parts(self, jobs, records, previous, output_dir):
+        """依上次的零件紀錄為這次的零件編號, 回傳 (依編號排序的 jobs, 內容未變更的編號, 新增, 修改, 刪除)
+        
+        內容雜湊相同的零件沿用原編號且視為未變更; 其餘依重心與大小找最相近的上次零件
+        (分數低於 INCREMENTAL_MATCH_LIMIT), 視為修改並沿用原編號; 找不到的為新增, 使用新的編號。
+        """
+        old = previous['parts'] if previous else []
+        new_records = [self._part_record(vertices, faces, normals) for _, _, vertices, faces, normals in jobs]
+        assignment = {}
+        by_digest = {}
+        for record in old:
+            by_digest.setdefault(record['digest'], []).append(record['part'])
+        for i, record in enumerate(new_records):
+            candidates = by_digest.get(record['digest'])
+            if candidates:
+                assignment[i] = candidates.pop(0)
+        unchanged = set(assignment.values())
+        
+        remaining_new = [i for i in range(len(new_records)) if i not in assignment]
+        remaining_old = [record for record in old if record['part'] not in unchanged]
+        if remaining_new and remaining_old:
+            new_centroid = np.array([new_records[i]['centroid'] for i in remaining_new])
+            new_diagonal = np.array([new_records[i]['diagonal'] for i in remaining_new])
+            old_centroid = np.array([record['centroid'] for record in remaining_old])
+            old_diagonal = np.maximum([record['diagonal'] for record in remaining_old], 1e-12)
+            score = (np.linalg.norm(new_centroid[:, None] - old_centroid[None], axis=2) / old_diagonal[None]
+                     + np.abs(np.log(np.maximum(new_diagonal, 1e-12)[:, None] / old_diagonal[None])))
+            taken = set()
+            for flat in np.argsort(score, axis=None, kind='stable'):
+                a, b = np.unravel_index(flat, score.shape)
+                if score[a, b] >= INCREMENTAL_MATCH_LIMIT:
+                    break
+                if remaining_new[a] not in assignment and b not in taken:
+                    assignment[remaining_new[a]] = remaining_old[b]['part']
+                    taken.add(b)
+        modified = sorted(set(assignment.values()) - unchanged)
+        removed = sorted({record['part'] for record in old} - set(assignment.values()))
+        
+        next_number = max((record['part'] for record in old), default=0) + 1
+        added = []
+        for i in range(len(new_records)):
+            if i not in assignment:
+                assignment[i] = next_number
+                added.append(next_number)
+                next_number += 1
+        
+        for i, record in enumerate(new_records):
+            records.append({'part': assignment[i], **record})
+        records.sort(key=lambda record: record['part'])
+        jobs = sorted(((assignment[i], output_dir / f"part_{assignment[i]}", vertices, faces, normals)
+                       for i, (_, _, vertices, faces, normals) in enumerate(jobs)), key=lambda job: job[0])
+        return jobs, unchanged, added, modified, removed
+    
+    def _morton_codes(self, points):
+        """把點量化到包圍盒內每軸 2^MORTON_BITS 格, 回傳交錯 x、y、z 位元的 uint64 Morton 碼"""
+        low = points.min(axis=0)
+        extent = points.max(axis=0) - low
+        extent[extent == 0] = 1.0
+        grid = ((points - low) / extent * ((1 << MORTON_BITS) - 1)).astype(np.uint64)
+        codes = np.zeros(len(points), dtype=np.uint64)
+        for axis in range(3):
+            # 把 21 個位元分散到每 3 個位元一個
+            x = grid[:, axis]
+            for shift, mask in ((32, 0x1f00000000ffff), (16, 0x1f0000ff0000ff), (8, 0x100f00f00f00f00f),
+                                (4, 0x10c30c30c30c30c3), (2, 0x1249249249249249)):
+                x = (x | (x << np.uint64(shift))) & np.uint64(mask)
+            codes |= x << np.uint64(axis)
+        return codes
+    
+    def _morton_face_order(self, vertices, faces):
+        """零件的面依重心的 Morton 碼排序後的順序"""
+        centroids = np.asarray(vertices, dtype=np.float64)[faces].mean(axis=1)
+        return np.argsort(self._morton_codes(centroids), kind='stable')
+    
+    def _write_part(self, base_filename, vertices, faces, normals, formats):
+        """以 formats 中的每種格式輸出單一零件"""
+        if self.morton_order and len(faces):
+            # 各格式的寫入都依面的順序重新編號頂點, 排序面即可讓頂點也大致沿同一條曲線排列
+            order = self._morton_face_order(vertices, faces)
+            faces, normals = faces[order], normals[order]
+        if 'stl' in formats:
+            self._write_binary_stl(base_filename.with_suffix('.stl'), vertices[faces], normals)
+        if 'obj' in formats:
+            self._write_obj(base_filename.with_suffix('.obj'), vertices, faces, normals)
+        if 'ply' in formats:
+            self._write_ply(base_filename.with_suffix('.ply'), vertices, faces)
+        if 'qmesh' in formats:
+            self._write_qmesh(base_filename.with_suffix('.qmesh'), vertices, faces, normals)
+    
+    def _export_parts(self, parts, formats, workers=1, executor=None):
+        """輸出所有零件, 依零件編號順序回傳每個零件的 (編號, 不含副檔名的檔名)
+        
+        workers > 1 時以多個程序平行格式化與寫檔, None 表示使用全部 CPU;
+        無法建立程序池時改為逐一輸出。executor 為呼叫端共用的程序池 (批次處理多個檔案時),
+        此時不另外建立, 也不會關閉它。
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        own_executor = None
+        if executor is None and workers > 1:
+            try:
+                own_executor = executor = ProcessPoolExecutor(max_workers=workers)
+            except (OSError, NotImplementedError, ImportError) as e:
+                print(f"無法建立平行輸出的程序池 ({e}), 改為逐一輸出")
+        
+        if executor is None:
+            for part_number, base_filename, vertices, faces, normals in parts:
+                self._write_part(base_filename, vertices, faces, normals, formats)
+                yield part_number, base_filename
+            return
+        
+        # 只傳送零件自己的頂點給工作程序, 並限制同時處理的零件數以控制記憶體
+        try:
+            pending = deque()
+            for part_number, base_filename, vertices, faces, normals in parts:
+                vertices, faces = self._part_mesh(vertices, faces)
+                future = executor.submit(self._write_part, base_filename, vertices, faces, normals, formats)
+                pending.append((part_number, base_filename, future))
+                if len(pending) >= 2 * workers:
+                    part_number, base_filename, future = pending.popleft()
+                    future.result()
+                    yield part_number, base_filename
+            while pending:
+                part_number, base_filename, future = pending.popleft()
+                future.result()
+                yield part_number, base_filename
+        finally:
+            if own_executor is not None:
+                own_executor.shutdown()
+    
+    def _input_digest(self, cache_dir):
+        """輸入檔案內容的 SHA-256
+        
+        依 (路徑, 大小, 修改時間) 記住上次的結果, 檔案未變動時不必重新讀取。
+        """
+        path = os.path.abspath(self.filename)
+        stat = os.stat(path)
+        digests_filename = cache_dir / "digests.json"
+        try:
+            with open(digests_filename, encoding='utf-8') as f:
+                digests = json.load(f)
+        except (OSError, ValueError):
+            digests = {}
+        known = digests.get(path)
+        if known is not None and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+        
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        digests[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        with open(digests_filename, 'w', encoding='utf-8') as f:
+            json.dump(digests, f)
+        return digest.hexdigest()
+    
+    def _output_settings(self, options):
+        """所有會影響輸出檔案內容的設定"""
+        return {
+            'version': CACHE_VERSION,
+            'scale': self.scale,
+            'weld_tolerance': self.weld_tolerance,
+            'obj_precision': self.obj_precision,
+            'smooth_normals': self.smooth_normals,
+            'crease_angle': self.crease_angle,
+            'morton_order': self.morton_order,
+            **options,
+        }
+    
+    def _cache_key(self, cache_dir, options):
+        """快取鍵: 輸入內容與所有會影響輸出的設定的雜湊"""
+        settings = {'input': self._input_digest(cache_dir), **self._output_settings(options)}
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def _load_cached(self, entry, output_dir, files):
+        """從快取複製輸出檔案 (加入 files) 並重印摘要, 回傳零件數; 沒有快取時回傳 None"""
+        try:
+            with open(entry / "meta.json", encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
         output_dir.mkdir(exist_ok=True)
+        for name in meta['files']:
+            shutil.copyfile(entry / name, output_dir / name)
+            files.append(output_dir / name)
+        # 以 meta.json 的修改時間記錄最後使用的時間
+        os.utime(entry / "meta.json")
+        # 摘要只存檔名, 以這次的輸出目錄重建路徑
+        for template, names in meta['summary']:
+            print(template.format(*(output_dir / name for name in names)))
+        print(f"(使用快取的分割結果: {entry})")
+        return meta['part_count']
+    
+    def _store_cache(self, entry, files, summary, part_count, size_limit):
+        """把這次的輸出存入快取, 再依最後使用時間刪除舊的結果直到總大小不超過 size_limit"""
+        staging = entry.with_name(entry.name + f".tmp{os.getpid()}")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        for path in files:
+            shutil.copyfile(path, staging / path.name)
+        meta = {
+            'part_count': part_count,
+            'files': [path.name for path in files],
+            'summary': summary,
+            'size': sum(path.stat().st_size for path in files),
+        }
+        with open(staging / "meta.json", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(staging, entry)
         
-        for i, component in enumerate(components):
-            component_triangles = triangles[component]
-            component_normals = normals[component]
-            
-            base_name = f"part_{i + 1}"
-            stl_filename = output_dir / f"{base_name}.stl"
-            obj_filename = output_dir / f"{base_name}.obj"
-            
-            #self._write_binary_stl(stl_filename, component_triangles, component_normals)
-            self._write_obj(obj_filename, component_triangles, component_normals)
-            
-            print(f"已儲存零件 {i + 1} 到:")
-            #print(f"  STL: {stl_filename}")
-            print(f"  OBJ: {obj_filename}")
-            print(f"  MTL: {obj_filename.with_suffix('.mtl')}")
+        entries = []
+        for candidate in entry.parent.iterdir():
+            try:
+                with open(candidate / "meta.json", encoding='utf-8') as f:
+                    size = json.load(f)['size']
+                entries.append((os.stat(candidate / "meta.json").st_mtime_ns, candidate != entry, size, candidate))
+            except (OSError, ValueError, KeyError):
+                continue
+        total = sum(size for _, _, size, _ in entries)
+        # 最久未使用的先刪, 剛存入的結果最後才刪
+        for _, _, size, candidate in sorted(entries, key=lambda e: (not e[1], e[0])):
+            if total <= size_limit:
+                break
+            shutil.rmtree(candidate, ignore_errors=True)
+            total -= size
+    
+    @contextmanager
+    def _stage(self, name):
+        """記錄階段耗時時, 把這段程式的時間累計到 name 階段
         
-        return len(components)
+        階段可以巢狀, 內層階段的時間不重複計入外層; 每次離開階段時也記下目前程序的峰值 RSS,
+        由此可看出記憶體在哪個階段達到峰值。
+        """
+        if self._stats is None:
+            yield
+            return
+        stack = self._stage_stack
+        now = time.perf_counter()
+        if stack:
+            self._add_stage_time(stack[-1][0], now - stack[-1][1])
+        stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            name, start = stack.pop()
+            self._add_stage_time(name, now - start)
+            if stack:
+                stack[-1][1] = now
+    
+    def _add_stage_time(self, name, seconds):
+        stage = self._stats['stages'].setdefault(name, {'seconds': 0.0, 'peak_rss': None})
+        stage['seconds'] += seconds
+        stage['peak_rss'] = peak_rss()
+    
+    def _timed_iter(self, name, iterable):
+        """把取得 iterable 每個元素的時間計入 name 階段 (用於逐個零件處理的產生器)"""
+        if self._stats is None:
+            return iterable
+        
+        def timed():
+            iterator = iter(iterable)
+            while True:
+                with self._stage(name):
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                yield item
+        return timed()
+    
+    def _count(self, **counts):
+        """記錄階段耗時時, 一併記下面數、頂點數等數量"""
+        if self._stats is not None:
+            self._stats.update(counts)
+    
+    def split_and_convert(self, out_of_core=False, work_dir=None, workers=1, formats=('obj',), instancing=False,
+                          density=None, bounding=False, cache_dir=None, cache_size_limit=DEFAULT_CACHE_SIZE_LIMIT,
+                          incremental=False, output_dir='split_parts', executor=None, instrument=False,
+                          log_file=None):
+        """分割 STL 檔案並轉換為 OBJ 格式
+        
+        formats 為每個零件輸出的格式: 'obj' (附 MTL)、'stl' (二進制, 用於 3D 列印)
+        、'ply' (二進制索引網格, 檔案較小且載入較快) 與 'qmesh' (量化的網頁下載格式,
+        見 write_quantized_mesh)。
+        out_of_core=True 時改用磁碟暫存檔分割 (僅限二進制 STL), 適用於大於記憶體的模型;
+        暫存檔放在 work_dir, 預設為系統暫存目錄。
+        workers 為平行輸出零件的程序數, 預設 1 表示逐一輸出; 也可以用 executor 傳入共用的程序池。
+        零件輸出到 output_dir, 預設為目前目錄下的 split_parts。
+        instancing=True 時形狀相同的零件只輸出第一個的網格, 每個零件使用的網格與剛體變換
+        寫入 split_parts/instances.json。
+        指定 density (kg/m^3) 時計算每個零件的體積、質量、質心與慣性張量, 連同可直接填入
+        Webots Physics 節點的欄位寫入 split_parts/mass_properties.json; 座標需已由 scale 換算為公尺。
+        bounding=True 時為每個零件選出 AABB、OBB、外接球與膠囊中體積最小者, 體積比寫入
+        split_parts/bounding_objects.json, Webots boundingObject 片段寫入 split_parts/bounding_objects.txt
+        (座標與零件網格相同)。
+        指定 cache_dir 時, 輸入檔案內容與輸出設定都相同的結果直接從快取複製;
+        快取總大小超過 cache_size_limit (bytes) 時刪除最久未使用的結果。
+        每次都會把零件紀錄寫入 split_parts/parts_manifest.json; incremental=True 時依上次的紀錄
+        沿用零件編號, 只重新輸出內容有變更的零件, 並刪除已不存在的零件的檔案
+        (此模式的結果取決於上次的輸出, 因此不使用快取)。
+        instrument=True 時記錄每個階段 (read、weld、split, 外部記憶體分割為 bucket、label、route,
+        以及 write 等) 的耗時與離開時的峰值 RSS、面數、頂點數、零件數與寫出的 bytes,
+        回傳 (零件總數, 報告 dict); 指定 log_file 時把報告以一行 JSON 附加到該檔案。
+        否則回傳零件總數。
+        """
+        unknown = set(formats) - set(OUTPUT_SUFFIXES)
+        if unknown:
+            raise ValueError(f"不支援的輸出格式: {sorted(unknown)}")
+        
+        output_dir = Path(output_dir)
+        options = {'formats': sorted(formats), 'instancing': instancing, 'density': density, 'bounding': bounding}
+        if incremental:
+            cache_dir = None
+        
+        files = []
+        part_count = None
+        if instrument or log_file is not None:
+            self._stats = {'file': os.path.abspath(self.filename), 'facets': None, 'vertices': None, 'stages': {}}
+            self._stage_stack = []
+        start = time.perf_counter()
+        try:
+            if cache_dir is not None:
+                with self._stage('cache'):
+                    cache_dir = Path(cache_dir)
+                    cache_dir.mkdir(parents=True, exist_ok=True)
+                    entry = cache_dir / self._cache_key(cache_dir, options)
+                    part_count = self._load_cached(entry, output_dir, files)
+            cached = part_count is not None
+            if not cached:
+                summary = []
+                part_count = self._split_and_convert(output_dir, files, summary, out_of_core, work_dir, workers,
+                                                     formats, instancing, density, bounding, incremental,
+                                                     self._output_settings(options), executor)
+                if cache_dir is not None:
+                    with self._stage('cache'):
+                        self._store_cache(entry, files, summary, part_count, cache_size_limit)
+            stats = self._stats
+        finally:
+            self._stats = None
+        if stats is None:
+            return part_count
+        
+        stats.update(seconds=time.perf_counter() - start, cached=cached, components=part_count,
+                     bytes_written=sum(path.stat().st_size for path in files if path.exists()), peak_rss=peak_rss())
+        if log_file is not None:
+            with open(log_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(stats, ensure_ascii=False) + '\n')
+        return (part_count, stats) if instrument else part_count
+    
+    def _split_and_convert(self, output_dir, files, summary, out_of_core, work_dir, workers, formats,
+                           instancing, density, bounding, incremental, settings, executor):
+        """split_and_convert 的實際工作, 寫出的檔案加入 files, 印出的摘要加入 summary
+        
+        summary 的每一行為 [格式字串, 檔名], 格式字串中的 {} 依序代入 output_dir 下的檔案路徑,
+        快取的結果複製到其他目錄時才能印出正確的路徑。
+        """
+        def report(template, *names):
+            print(template.format(*(output_dir / name for name in names)))
+            summary.append([template, list(names)])
+        
+        if out_of_core and not self.is_binary:
+            print("ASCII STL 無法記憶體映射, 改用記憶體內分割")
+        if out_of_core and self.is_binary:
+            parts = self._iter_out_of_core_parts(work_dir)
+        else:
+            parts = self._iter_in_memory_parts()
+        # 從分割結果取出每個零件的時間也計入 split 階段
+        parts = self._timed_iter('split', parts)
+        
+        output_dir.mkdir(exist_ok=True)
+        
+        jobs = ((i + 1, output_dir / f"part_{i + 1}", vertices, faces, normals)
+                for i, (vertices, faces, normals) in enumerate(parts))
+        manifest_filename = output_dir / "parts_manifest.json"
+        part_records = []
+        skipped = set()
+        if incremental:
+            try:
+                with open(manifest_filename, encoding='utf-8') as f:
+                    previous = json.load(f)
+            except (OSError, ValueError):
+                previous = None
+            jobs = list(jobs)
+            with self._stage('incremental'):
+                jobs, unchanged, added, modified, removed = self._match_previous_parts(jobs, part_records, previous,
+                                                                                       output_dir)
+            # 設定相同且檔案都還在時, 內容未變更的零件不必重寫
+            previous_files = {record['part']: record['files'] for record in previous['parts']} if previous else {}
+            if previous is not None and previous.get('settings') == settings:
+                skipped = {part for part in unchanged
+                           if all((output_dir / name).exists() for name in previous_files[part])}
+            for part in removed:
+                for name in previous_files[part]:
+                    (output_dir / name).unlink(missing_ok=True)
+        else:
+            jobs = self._timed_iter('manifest', self._collect_part_records(jobs, part_records))
+        mass_properties = []
+        if density is not None:
+            jobs = self._timed_iter('mass_properties', self._collect_mass_properties(jobs, mass_properties, density))
+        bounding_objects = []
+        if bounding:
+            jobs = self._timed_iter('bounding', self._collect_bounding_primitives(jobs, bounding_objects))
+        instances = []
+        if instancing:
+            jobs = self._timed_iter('instancing', self._instance_parts(jobs, instances))
+        if skipped:
+            jobs = (job for job in jobs if job[0] not in skipped)
+        
+        part_count = 0
+        exported = self._timed_iter('write', self._export_parts(jobs, formats, workers, executor))
+        for part_number, base_filename in exported:
+            part_count += 1
+            report(f"已儲存零件 {part_number} 到:")
+            for output_format, suffixes in OUTPUT_SUFFIXES.items():
+                if output_format in formats:
+                    for suffix in suffixes:
+                        files.append(base_filename.with_suffix(suffix))
+                        report(f"  {suffix[1:].upper()}: {{}}", files[-1].name)
+        
+        if density is not None:
+            mass_filename = output_dir / "mass_properties.json"
+            with open(mass_filename, 'w', encoding='utf-8') as f:
+                json.dump({'density': density, 'parts': mass_properties}, f, indent=2)
+            files.append(mass_filename)
+            report("質量性質已儲存到: {}", mass_filename.name)
+        
+        if bounding:
+            bounding_filename = output_dir / "bounding_objects.json"
+            with open(bounding_filename, 'w', encoding='utf-8') as f:
+                json.dump({'parts': bounding_objects}, f, indent=2)
+            with open(bounding_filename.with_suffix('.txt'), 'w', encoding='utf-8') as f:
+                for record in bounding_objects:
+                    ratio = record['volume_ratio']
+                    ratio = f"{ratio:.2f}" if ratio is not None else "無法計算"
+                    f.write(f"# part_{record['part']}: {record['primitive']}, 體積比 {ratio}\n{record['webots']}\n\n")
+            files += [bounding_filename, bounding_filename.with_suffix('.txt')]
+            report("碰撞基本形狀已儲存到: {}, {}", bounding_filename.name, bounding_filename.with_suffix('.txt').name)
+        
+        if instancing:
+            instances_filename = output_dir / "instances.json"
+            with open(instances_filename, 'w', encoding='utf-8') as f:
+                json.dump({'instances': instances}, f, indent=2)
+            files.append(instances_filename)
+            instanced = sum(instance['mesh'] != f"part_{instance['part']}" for instance in instances)
+            report(f"{instanced} 個零件與其他零件形狀相同, 實例變換已儲存到: {{}}", instances_filename.name)
+        
+        for record in part_records:
+            record['files'] = [f"part_{record['part']}{suffix}" for output_format, suffixes in OUTPUT_SUFFIXES.items()
+                               if output_format in formats for suffix in suffixes
+                               if (output_dir / f"part_{record['part']}{suffix}").exists()]
+        with self._stage('manifest'), open(manifest_filename, 'w', encoding='utf-8') as f:
+            json.dump({'settings': settings, 'parts': part_records}, f, indent=2)
+        files.append(manifest_filename)
+        if incremental:
+            report(f"增量分割: {len(skipped)} 個零件未變更, 修改 {modified}, 新增 {added}, 刪除 {removed}")
+        
+        return len(part_records)
+
+
+def peak_rss():
+    """目前程序的峰值常駐記憶體 (bytes), 無法取得時回傳 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以 bytes 為單位, 其他系統以 KB 為單位
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def read_binary_ply(filename):
+    """讀取 _write_ply 輸出的 PLY 檔案, 回傳 (float32 頂點, int32 面索引)"""
+    with open(filename, 'rb') as f:
+        data = f.read()
+    end = data.index(b"end_header\n") + len(b"end_header\n")
+    counts = {}
+    for line in data[:end].decode('ascii').splitlines():
+        fields = line.split()
+        if fields[:1] == ['format'] and fields[1] != 'binary_little_endian':
+            raise ValueError(f"不支援的 PLY 格式: {fields[1]}")
+        if fields[:1] == ['element']:
+            counts[fields[1]] = int(fields[2])
+    vertices = np.frombuffer(data, dtype='<f4', count=3 * counts['vertex'], offset=end).reshape(-1, 3)
+    records = np.frombuffer(data, dtype=PLY_FACE_DTYPE, count=counts['face'], offset=end + vertices.nbytes)
+    if np.any(records['count'] != 3):
+        raise ValueError("PLY 檔案包含非三角形的面")
+    return vertices, records['indices']
+
+
+def _zigzag_varint(values):
+    """把有號整數以 zigzag 轉為無號數, 再以 LEB128 varint (每 byte 7 位元, 最高位元表示後面還有) 編碼"""
+    values = np.asarray(values, dtype=np.int64)
+    unsigned = ((values << 1) ^ (values >> 63)).astype(np.uint64)
+    lengths = np.ones(len(unsigned), dtype=np.int64)
+    for k in range(1, 10):
+        lengths += unsigned >= np.uint64(1 << (7 * k))
+    starts = np.cumsum(lengths) - lengths
+    position = np.arange(lengths.sum()) - np.repeat(starts, lengths)
+    encoded = (np.repeat(unsigned, lengths) >> (7 * position).astype(np.uint64)) & np.uint64(0x7f)
+    encoded[position < np.repeat(lengths, lengths) - 1] |= np.uint64(0x80)
+    return encoded.astype(np.uint8)
+
+
+def _zigzag_varint_decode(data):
+    """_zigzag_varint 的反向"""
+    data = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(data < 0x80)
+    if len(ends) and ends[-1] != len(data) - 1 or len(data) and not len(ends):
+        raise ValueError("varint 資料不完整")
+    starts = np.concatenate([[0], ends[:-1] + 1]).astype(np.int64)
+    position = np.arange(len(data)) - np.repeat(starts, np.diff(np.append(starts, len(data))))
+    chunks = (data & 0x7f).astype(np.uint64) << (7 * position).astype(np.uint64)
+    unsigned = np.add.reduceat(chunks, starts) if len(data) else np.zeros(0, dtype=np.uint64)
+    return (unsigned >> np.uint64(1)).astype(np.int64) ^ -(unsigned & np.uint64(1)).astype(np.int64)
+
+
+def _octahedral_encode(normals, bits):
+    """把單位向量投影到八面體再展開成正方形, 回傳每個向量兩個 bits 位元的有號整數"""
+    n = normals / np.abs(normals).sum(axis=1, keepdims=True)
+    x, y = n[:, 0], n[:, 1]
+    sign_x = np.where(x >= 0, 1.0, -1.0)
+    sign_y = np.where(y >= 0, 1.0, -1.0)
+    lower = n[:, 2] < 0
+    # 下半球折到正方形的四個角
+    x, y = np.where(lower, (1 - np.abs(n[:, 1])) * sign_x, x), np.where(lower, (1 - np.abs(n[:, 0])) * sign_y, y)
+    limit = (1 << (bits - 1)) - 1
+    return np.round(np.clip(np.stack([x, y], axis=1), -1, 1) * limit).astype(np.int8 if bits <= 8 else np.int16)
+
+
+def _octahedral_decode(encoded, bits):
+    """_octahedral_encode 的反向, 回傳 float64 單位向量"""
+    xy = encoded.astype(np.float64) / ((1 << (bits - 1)) - 1)
+    x, y = xy[:, 0], xy[:, 1]
+    z = 1 - np.abs(x) - np.abs(y)
+    fold = np.clip(-z, 0, None)
+    x = x - np.where(x >= 0, fold, -fold)
+    y = y - np.where(y >= 0, fold, -fold)
+    normals = np.stack([x, y, z], axis=1)
+    return normals / np.linalg.norm(normals, axis=1, keepdims=True)
+
+
+def write_quantized_mesh(filename, meshes, position_bits=QMESH_POSITION_BITS, normal_bits=QMESH_NORMAL_BITS):
+    """把多個網格寫入一個量化網格容器 (.qmesh), 供網頁下載
+    
+    meshes 為 (名稱, 頂點, 從 0 開始的面索引, 每個面的法向量) 的序列, 例如 split_and_convert 的單一零件,
+    或以 iter_components 取得的整個組立件:
+        write_quantized_mesh('assembly.qmesh', [(f"part_{i}", v, f, n) for i, v, f, n in converter.iter_components()])
+    座標量化為包圍盒內 position_bits (最多 16) 位元的整數, 每軸誤差不超過量化步長的一半 (記錄在說明中);
+    面索引逐一與前一個索引相減後以 zigzag varint 編碼 (依第一次出現順序編號的頂點差值都很小);
+    法向量以八面體編碼為兩個 normal_bits (8 或 16) 位元的整數, 長度為 0 的法向量改用三角形的幾何法向量。
+    """
+    if not 1 <= position_bits <= 16:
+        raise ValueError(f"position_bits 必須介於 1 與 16 之間: {position_bits}")
+    if normal_bits not in (8, 16):
+        raise ValueError(f"normal_bits 必須是 8 或 16: {normal_bits}")
+    levels = (1 << position_bits) - 1
+    entries = []
+    blocks = []
+    offset = 0
+    for name, vertices, faces, normals in meshes:
+        vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+        faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+        normals = np.asarray(normals, dtype=np.float64).reshape(-1, 3)
+        if len(vertices):
+            low, high = vertices.min(axis=0), vertices.max(axis=0)
+        else:
+            low = high = np.zeros(3)
+        extent = high - low
+        step = extent / levels
+        positions = np.round((vertices - low) / np.where(extent > 0, extent, 1.0) * levels).astype('<u2')
+        
+        lengths = np.linalg.norm(normals, axis=1)
+        invalid = ~(lengths > 0)
+        if invalid.any():
+            corners = vertices[faces[invalid]]
+            normals = normals.copy()
+            normals[invalid] = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+            lengths = np.linalg.norm(normals, axis=1)
+            # 退化三角形沒有方向, 任意使用 +z
+            normals[~(lengths > 0)] = [0.0, 0.0, 1.0]
+        octahedral = _octahedral_encode(normals, normal_bits).astype('<i1' if normal_bits == 8 else '<i2')
+        indices = _zigzag_varint(np.diff(faces.ravel(), prepend=0))
+        
+        entry = {'name': name, 'vertex_count': len(vertices), 'face_count': len(faces),
+                 'bbox_min': low.tolist(), 'bbox_max': high.tolist(),
+                 'position_bits': position_bits, 'position_step': step.tolist(), 'normal_bits': normal_bits,
+                 'buffers': {}}
+        for key, block in (('positions', positions), ('indices', indices), ('normals', octahedral)):
+            data = block.tobytes()
+            entry['buffers'][key] = [offset, len(data)]
+            blocks.append(data)
+            offset += len(data)
+        entries.append(entry)
+    
+    manifest = json.dumps({'version': QMESH_VERSION, 'meshes': entries}, separators=(',', ':')).encode('utf-8')
+    manifest += b' ' * (-len(manifest) % 4)
+    with open(filename, 'wb') as f:
+        f.write(QMESH_HEADER.pack(QMESH_MAGIC, QMESH_VERSION, len(manifest)))
+        f.write(manifest)
+        for data in blocks:
+            f.write(data)
+
+
+def read_quantized_mesh(filename):
+    """讀取 write_quantized_mesh 輸出的容器, 回傳說明中的網格清單
+    
+    每個網格的 dict 另外加上 'vertices' (float64)、'faces' (int64) 與 'normals' (float64 單位向量)。
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    magic, version, manifest_length = QMESH_HEADER.unpack_from(data)
+    if magic != QMESH_MAGIC:
+        raise ValueError(f"不是量化網格檔案: {filename}")
+    if version != QMESH_VERSION:
+        raise ValueError(f"不支援的量化網格版本: {version}")
+    base = QMESH_HEADER.size + manifest_length
+    meshes = json.loads(data[QMESH_HEADER.size:base].decode('utf-8'))['meshes']
+    
+    def block(entry, key):
+        start, length = entry['buffers'][key]
+        if base + start + length > len(data):
+            raise ValueError(f"量化網格檔案不完整: {filename}")
+        return data[base + start:base + start + length]
+    
+    for mesh in meshes:
+        positions = np.frombuffer(block(mesh, 'positions'), dtype='<u2').reshape(-1, 3)
+        mesh['vertices'] = np.asarray(mesh['bbox_min']) + positions * np.asarray(mesh['position_step'])
+        faces = np.cumsum(_zigzag_varint_decode(block(mesh, 'indices')))
+        if len(faces) != 3 * mesh['face_count']:
+            raise ValueError(f"量化網格的面數不符: {mesh['name']}")
+        mesh['faces'] = faces.reshape(-1, 3)
+        dtype = '<i1' if mesh['normal_bits'] == 8 else '<i2'
+        mesh['normals'] = _octahedral_decode(np.frombuffer(block(mesh, 'normals'), dtype=dtype).reshape(-1, 2),
+                                             mesh['normal_bits'])
+    return meshes
+
+
+def expand_inputs(patterns):
+    """展開命令列的檔案、目錄 (其中所有 .stl) 與萬用字元, 回傳不重複的檔案清單"""
+    stl_files = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = sorted(p for p in path.iterdir() if p.suffix.lower() == '.stl')
+        elif any(c in pattern for c in '*?['):
+            matches = sorted(Path(p) for p in glob.glob(pattern, recursive=True))
+        else:
+            matches = [path]
+        for match in matches:
+            if match not in stl_files:
+                stl_files.append(match)
+    return stl_files
+
+
+def main(argv=None, default_stl_file="openduck_assembly2.stl", default_scale=0.001):
+    """命令列入口: 在同一個程序中依序分割多個 STL 檔案, 共用平行輸出的程序池, 最後列出每個檔案的耗時
+    
+    每個檔案的零件輸出到該檔案所在目錄的 split_parts; 回傳結束代碼 (有檔案失敗時為 1)。
+    """
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="分割 STL 組立檔並轉換為 OBJ 零件")
+    parser.add_argument("stl_files", nargs='*', metavar="stl_file",
+                        help=f"STL 檔案、目錄或萬用字元 (如 'downloads/**/*.stl'), 預設為 {default_stl_file}")
+    parser.add_argument("--scale", type=float, default=default_scale, help=f"座標縮放比例 (預設 {default_scale})")
+    parser.add_argument("--formats", default="obj", help="輸出格式, 以逗號分隔: obj, stl, ply, qmesh (預設 obj)")
+    parser.add_argument("--workers", type=int, default=1, help="平行輸出零件的程序數, 0 表示使用全部 CPU (預設 1)")
+    parser.add_argument("--weld-tolerance", type=float, default=0.0, help="焊接頂點的容許誤差 (縮放後的單位)")
+    parser.add_argument("--precision", type=int, default=None, help="OBJ 座標的有效位數 (預設完整精度)")
+    parser.add_argument("--smooth-normals", action='store_true', help="輸出共用的頂點法向量")
+    parser.add_argument("--crease-angle", type=float, default=np.pi / 6, help="平滑法向量的折角 (弧度)")
+    parser.add_argument("--morton-order", action='store_true',
+                        help="依 Z-order 曲線排序零件的面與頂點 (適用於面順序被打亂的網格)")
+    parser.add_argument("--out-of-core", action='store_true', help="以磁碟暫存檔分割大於記憶體的模型")
+    parser.add_argument("--instancing", action='store_true', help="形狀相同的零件只輸出一次網格")
+    parser.add_argument("--density", type=float, default=None, help="密度 (kg/m^3), 指定時輸出質量性質")
+    parser.add_argument("--bounding", action='store_true', help="輸出 Webots boundingObject 基本形狀")
+    parser.add_argument("--incremental", action='store_true', help="沿用上次的零件編號, 只重寫有變更的零件")
+    parser.add_argument("--cache-dir", default=".split_cache", help="分割結果快取目錄")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_CACHE_SIZE_LIMIT / 2 ** 20,
+                        help="快取容量上限 (MB), 超過時刪除最久未使用的結果")
+    parser.add_argument("--no-cache", action='store_true', help="不讀取也不寫入快取")
+    parser.add_argument("--timing-json", default=None, help="另外把每個檔案的耗時摘要寫入此 JSON 檔")
+    parser.add_argument("--stats-log", default=None,
+                        help="把每個檔案各階段的耗時、峰值 RSS 與數量以一行 JSON 附加到此檔案")
+    args = parser.parse_args(argv)
+    
+    stl_files = expand_inputs(args.stl_files or [default_stl_file])
+    workers = args.workers or os.cpu_count() or 1
+    executor = None
+    if workers > 1 and len(stl_files) > 1:
+        try:
+            executor = ProcessPoolExecutor(max_workers=workers)
+        except (OSError, NotImplementedError, ImportError) as e:
+            print(f"無法建立平行輸出的程序池 ({e}), 改為逐一輸出")
+    
+    timings = []
+    try:
+        for stl_file in stl_files:
+            if len(stl_files) > 1:
+                print(f"\n=== {stl_file} ===")
+            start = time.perf_counter()
+            record = {'file': str(stl_file), 'parts': None, 'error': None}
+            try:
+                # 創建轉換器實例並執行轉換
+                converter = STLConverter(str(stl_file), scale=args.scale, weld_tolerance=args.weld_tolerance,
+                                         obj_precision=args.precision, smooth_normals=args.smooth_normals,
+                                         crease_angle=args.crease_angle, morton_order=args.morton_order)
+                record['parts'] = converter.split_and_convert(
+                    out_of_core=args.out_of_core, workers=workers, formats=tuple(args.formats.split(',')),
+                    instancing=args.instancing, density=args.density, bounding=args.bounding,
+                    cache_dir=None if args.no_cache else args.cache_dir,
+                    cache_size_limit=int(args.cache_size * 2 ** 20), incremental=args.incremental,
+                    output_dir=stl_file.parent / 'split_parts', executor=executor, log_file=args.stats_log)
+                print(f"\n總共處理了 {record['parts']} 個零件")
+            except Exception as e:
+                record['error'] = str(e)
+                print(f"錯誤: {e}")
+            record['seconds'] = time.perf_counter() - start
+            timings.append(record)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    print("\n檔案耗時:")
+    for record in timings:
+        status = f"{record['parts']} 個零件" if record['error'] is None else f"失敗: {record['error']}"
+        print(f"  {record['seconds']:8.3f} s  {record['file']} ({status})")
+    print(f"  {sum(r['seconds'] for r in timings):8.3f} s  合計 {len(timings)} 個檔案")
+    if args.timing_json:
+        with open(args.timing_json, 'w', encoding='utf-8') as f:
+            json.dump({'files': timings}, f, indent=2, ensure_ascii=False)
+    return 1 if any(record['error'] is not None for record in timings) else 0
+
 
 # 直接轉換指定的 STL 檔案
-try:
-    # 指定要轉換的 STL 檔案名稱和縮放比例
-    stl_file = "openduck_assembly2.stl"
-    scale = 0.001  #convert to m
-
-    # 創建轉換器實例並執行轉換
-    converter = STLConverter(stl_file, scale=scale)
-    num_parts = converter.split_and_convert()
-    print(f"\n總共處理了 {num_parts} 個零件")
-except Exception as e:
-    print(f"錯誤: {e}")
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import check_repaired_simplified
+import numpy as np
+import trimesh
+
+_process_part = check_repaired_simplified._process_part
+
+
+def _crashing_process_part(input_path, *args):
+    """處理 part_2 時讓工作程序直接結束, 模擬原生程式庫當掉"""
+    if os.path.basename(input_path) == "part_2.obj":
+        os._exit(1)
+    return _process_part(input_path, *args)
+
+
+def write_face_normal_obj(filename, mesh):
+    """以 split_stl_to_obj_scale2_w_mtl 的格式寫出 OBJ: 共用頂點, 每個面一個法向量"""
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.writelines(f"v {x!r} {y!r} {z!r}\n" for x, y, z in mesh.vertices.tolist())
+        f.writelines(f"vn {x!r} {y!r} {z!r}\n" for x, y, z in mesh.face_normals.tolist())
+        f.writelines(f"f {a + 1}//{i + 1} {b + 1}//{i + 1} {c + 1}//{i + 1}\n"
+                     for i, (a, b, c) in enumerate(mesh.faces.tolist()))
+
+
+class TestCheckRepairSimplify(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.tmpdir, "part_1.obj")
+        self.mesh = trimesh.creation.icosphere(subdivisions=2)
+        write_face_normal_obj(self.input_path, self.mesh)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def check(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return check_repaired_simplified.check_repair_simplify_obj(self.input_path, **kwargs)
+
+    def test_only_final_obj_written(self):
+        output_dir = os.path.join(self.tmpdir, "output")
+        before = set(os.listdir(self.tmpdir))
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir)
+        try:
+            self.check(output_dir=output_dir)
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(set(os.listdir(self.tmpdir)) - before, {"output"})
+        self.assertEqual(os.listdir(output_dir), ["part_1_repaired_simplified.obj"])
+
+        temp_dir = os.path.join(self.tmpdir, "temp")
+        self.check(output_dir=os.path.join(self.tmpdir, "output_2"), temp_dir=temp_dir)
+        self.assertEqual(os.listdir(temp_dir), ["part_1_repaired.obj"])
+        repaired = trimesh.load(os.path.join(temp_dir, "part_1_repaired.obj"), file_type='obj', force='mesh')
+        self.assertEqual(len(repaired.faces), len(self.mesh.faces))
+
+    def test_result(self):
+        output_dir = os.path.join(self.tmpdir, "output")
+        result = self.check(output_dir=output_dir, simplify_ratio=0.5)
+        output_path = os.path.join(output_dir, "part_1_repaired_simplified.obj")
+        # 每個面各有法向量的 OBJ 在載入時頂點被分開, 焊接回共用頂點後才是閉合的
+        self.assertFalse(trimesh.load(self.input_path, file_type='obj', force='mesh', process=False).is_watertight)
+        self.assertEqual(result, {
+            'input': self.input_path, 'output': output_path, 'error': None, 'max_error': None,
+            'vertices': len(self.mesh.vertices), 'faces': len(self.mesh.faces), 'watertight': True,
+            'repaired_watertight': True, 'achieved_error': None,
+            'final_vertices': result['final_vertices'], 'final_faces': len(self.mesh.faces) // 2,
+            'final_watertight': True,
+        })
+        final = trimesh.load(output_path, file_type='obj', force='mesh')
+        self.assertEqual((len(final.vertices), len(final.faces)), (result['final_vertices'], result['final_faces']))
+
+        self.input_path = os.path.join(self.tmpdir, "missing.obj")
+        missing = self.check(output_dir=output_dir)
+        self.assertIsNone(missing['output'])
+        self.assertIsNotNone(missing['error'])
+
+
+def brute_distance(mesh, points):
+    """逐一計算每個點到所有三角形的距離, 取最小值"""
+    distances = []
+    for block in np.array_split(points, -(-len(points) // 100)):
+        repeated = np.repeat(block, len(mesh.faces), axis=0)
+        closest = trimesh.triangles.closest_point(np.tile(mesh.triangles, (len(block), 1, 1)), repeated)
+        distances.append(np.linalg.norm(closest - repeated, axis=1).reshape(len(block), -1).min(axis=1))
+    return np.concatenate(distances)
+
+
+class TestErrorBoundedSimplification(unittest.TestCase):
+    def setUp(self):
+        self.mesh = trimesh.creation.icosphere(subdivisions=2)
+
+    def test_surface_distance_matches_brute_force(self):
+        reference = check_repaired_simplified.SurfaceDistance(self.mesh, 2000)
+        surface, _ = trimesh.sample.sample_surface(self.mesh, 500, seed=3)
+        points = surface + np.random.default_rng(0).normal(scale=0.3, size=surface.shape)
+        expected = brute_distance(self.mesh, points)
+        self.assertTrue(np.allclose(reference.distances(points), expected))
+        self.assertAlmostEqual(reference.max_distance(points, batch=16), expected.max())
+
+        # 雙向的最大距離, 取樣點與 SurfaceDistance 相同
+        simplified = self.mesh.simplify_quadric_decimation(face_count=80)
+        other = check_repaired_simplified.SurfaceDistance(simplified, 2000)
+        expected = max(brute_distance(self.mesh, other.points).max(), brute_distance(simplified, reference.points).max())
+        self.assertAlmostEqual(check_repaired_simplified.hausdorff_estimate(reference, simplified, 2000), expected)
+        self.assertAlmostEqual(check_repaired_simplified.hausdorff_estimate(self.mesh, simplified, 2000), expected)
+
+    def test_simplify_to_error(self):
+        decimate = trimesh.Trimesh.simplify_quadric_decimation
+        face_counts = []
+
+        def counting_decimate(mesh, *args, **kwargs):
+            face_counts.append(kwargs['face_count'])
+            return decimate(mesh, *args, **kwargs)
+
+        max_error = 0.05
+        with mock.patch.object(trimesh.Trimesh, 'simplify_quadric_decimation', counting_decimate):
+            simplified, error, tried = check_repaired_simplified.simplify_to_error(self.mesh, max_error)
+        self.assertLess(len(simplified.faces), len(self.mesh.faces) // 2)
+        self.assertLessEqual(error, max_error)
+        # 每個目標面數只簡化一次
+        self.assertEqual(len(face_counts), tried)
+        self.assertEqual(len(set(face_counts)), tried)
+
+        # 以另外的密集取樣點逐一計算, 誤差仍在上限內
+        dense = max(brute_distance(self.mesh, trimesh.sample.sample_surface(simplified, 3000, seed=5)[0]).max(),
+                    brute_distance(simplified, trimesh.sample.sample_surface(self.mesh, 3000, seed=6)[0]).max())
+        self.assertLessEqual(dense, max_error)
+
+        # 無法在誤差內簡化時回傳原本的 mesh
+        unchanged, error, _ = check_repaired_simplified.simplify_to_error(self.mesh, 1e-9)
+        self.assertIs(unchanged, self.mesh)
+        self.assertEqual(error, 0.0)
+
+    def test_error_measured_after_fill_holes(self):
+        # 簡化結果缺一個面, 填充孔洞後重新估計的誤差是寫出的模型與原模型的距離
+        original = self.mesh.copy()
+        original.apply_scale(1.01)
+        holed = trimesh.Trimesh(self.mesh.vertices, self.mesh.faces[1:])
+        with mock.patch.object(check_repaired_simplified, 'simplify_to_error', return_value=(holed, 0.0, 1)), \
+                contextlib.redirect_stdout(io.StringIO()):
+            simplified, error = check_repaired_simplified.simplify_mesh(original, 0.5, max_error=0.02)
+        self.assertIs(simplified, holed)
+        self.assertEqual(len(simplified.faces), len(self.mesh.faces))
+        # 重新估計使用填充後的模型 (估計值不小於精確的 Hausdorff 距離 0.01)
+        self.assertEqual(error, check_repaired_simplified.hausdorff_estimate(
+            original, holed, check_repaired_simplified._error_samples(original, 0.02)))
+        self.assertGreaterEqual(error, 0.0099)
+
+    def test_ratio_mode_without_scipy(self):
+        # 依比例簡化不需要 scipy
+        script = (
+            "import sys; sys.modules['scipy'] = sys.modules['scipy.spatial'] = None\n"
+            "import contextlib, io, check_repaired_simplified\n"
+            "with contextlib.redirect_stdout(io.StringIO()):\n"
+            "    result = check_repaired_simplified.check_repair_simplify_obj(sys.argv[1], sys.argv[2])\n"
+            "print(result['error'], result['final_faces'])\n"
+        )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_path = os.path.join(tmpdir, "part_1.obj")
+            self.mesh.export(input_path, file_type='obj')
+            output = subprocess.run([sys.executable, "-c", script, input_path, os.path.join(tmpdir, "out")],
+                                    capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(check_repaired_simplified.__file__)))
+        self.assertEqual(output.stdout.split(), ["None", str(len(self.mesh.faces) // 2)])
+
+
+class TestBatchRepairSimplify(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.tmpdir, "split_parts")
+        os.makedirs(self.input_dir)
+        for i in range(1, 7):
+            mesh = trimesh.creation.icosphere(subdivisions=2, radius=0.01 * i)
+            mesh.export(os.path.join(self.input_dir, f"part_{i}.obj"), file_type='obj')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def batch(self, name, **kwargs):
+        output_dir = os.path.join(self.tmpdir, name)
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            report = check_repaired_simplified.batch_repair_simplify(self.input_dir, output_dir, **kwargs)
+        with open(os.path.join(output_dir, "report.json"), encoding='utf-8') as f:
+            self.assertEqual(json.load(f), report)
+        return report, log.getvalue(), output_dir
+
+    def test_parallel_matches_serial(self):
+        serial, serial_log, serial_dir = self.batch('serial', workers=1)
+        parallel, parallel_log, parallel_dir = self.batch('parallel', workers=3)
+        self.assertEqual(serial['summary'], parallel['summary'])
+        self.assertEqual(serial['summary']['failed'], 0)
+
+        def without_timing(report, output_dir):
+            return [{k: v.replace(output_dir, '') if k == 'output' else v for k, v in part.items() if k != 'seconds'}
+                    for part in report['parts']]
+        self.assertEqual(without_timing(serial, serial_dir), without_timing(parallel, parallel_dir))
+        self.assertEqual([Path(p['input']).name for p in parallel['parts']], [f"part_{i}.obj" for i in range(1, 7)])
+        for i in range(1, 7):
+            name = f"part_{i}_repaired_simplified.obj"
+            self.assertEqual(Path(serial_dir, name).read_bytes(), Path(parallel_dir, name).read_bytes())
+        # 各零件的訊息相同且依零件順序, 只有最後的耗時不同
+        self.assertEqual(serial_log.replace(serial_dir, '').split("\n共處理")[0],
+                         parallel_log.replace(parallel_dir, '').split("\n共處理")[0])
+
+    def test_max_error_report(self):
+        report, log, _ = self.batch('bounded', workers=1, max_error=0.001)
+        errors = [part['achieved_error'] for part in report['parts']]
+        self.assertEqual(report['max_error'], 0.001)
+        self.assertTrue(all(part['max_error'] == 0.001 for part in report['parts']))
+        self.assertTrue(all(error is not None and error <= 0.001 for error in errors))
+        self.assertEqual(report['summary']['max_achieved_error'], max(errors))
+        self.assertLess(report['summary']['final_faces'], report['summary']['faces'])
+        self.assertIn("各零件的最大估計誤差", log)
+
+        ratio, _, _ = self.batch('ratio', workers=1)
+        self.assertIsNone(ratio['summary']['max_achieved_error'])
+        self.assertTrue(all(part['achieved_error'] is None for part in ratio['parts']))
+
+    def test_worker_crash_is_isolated(self):
+        with mock.patch.object(check_repaired_simplified, '_process_part', _crashing_process_part):
+            report, log, _ = self.batch('crash', workers=3)
+        errors = {Path(part['input']).name: part['error'] for part in report['parts']}
+        self.assertEqual(report['summary']['parts'], 6)
+        self.assertEqual(report['summary']['failed'], 1)
+        self.assertIn("工作程序失敗", errors.pop("part_2.obj"))
+        self.assertEqual(set(errors.values()), {None})
+        self.assertIn("part_2.obj 處理失敗", log)
+
+    def test_failed_part_message(self):
+        # 沒有訊息的例外以類別名稱表示
+        for error, message in [(RuntimeError("boom"), "boom"), (MemoryError(), "MemoryError"),
+                               (KeyError(), "KeyError")]:
+            result, log = check_repaired_simplified._failed_part("part_1.obj", error)
+            self.assertEqual(result['error'], f"工作程序失敗: {message}")
+            self.assertIn(result['error'], log)
+
+
+if __name__ == "__main__":
+    unittest.main()
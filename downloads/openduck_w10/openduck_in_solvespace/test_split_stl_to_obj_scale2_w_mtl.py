@@ -0,0 +1,880 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import struct
+import tempfile
+import time
+import tracemalloc
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import split_stl_to_obj_scale2_w_mtl
+from split_stl_to_obj_scale2_w_mtl import STL_FACET_DTYPE, STLConverter, read_binary_ply
+
+
+def write_binary_stl(filename, triangles, normals):
+    """以 STL_FACET_DTYPE 寫出測試用的二進制 STL 檔案"""
+    facets = np.zeros(len(triangles), dtype=STL_FACET_DTYPE)
+    facets['normal'] = normals
+    facets['vertices'] = triangles
+    with open(filename, 'wb') as f:
+        f.write(b'\x00' * 80)
+        f.write(struct.pack('<I', len(facets)))
+        f.write(facets.tobytes())
+
+
+def random_mesh(n_triangles, seed=0):
+    rng = np.random.default_rng(seed)
+    triangles = rng.uniform(-500.0, 500.0, size=(n_triangles, 3, 3)).astype(np.float32)
+    normals = rng.uniform(-1.0, 1.0, size=(n_triangles, 3)).astype(np.float32)
+    return triangles, normals
+
+
+def write_ascii_stl(filename, triangles, normals):
+    with open(filename, 'w') as f:
+        f.write("solid test\n")
+        for triangle, normal in zip(triangles, normals, strict=True):
+            f.write(f"  facet normal {normal[0]!r} {normal[1]!r} {normal[2]!r}\n    outer loop\n")
+            for vertex in triangle:
+                f.write(f"      vertex {vertex[0]!r} {vertex[1]!r} {vertex[2]!r}\n")
+            f.write("    endloop\n  endfacet\n")
+        f.write("endsolid test\n")
+
+
+def write_grid_stl(filename, n, rows_per_block=64):
+    """逐列寫出 n x n 格網 (2 n^2 個面, (n + 1)^2 個頂點), 產生大型檔案時不佔用大量記憶體"""
+    with open(filename, 'wb') as f:
+        f.write(b'\x00' * 80)
+        f.write(struct.pack('<I', 2 * n * n))
+        for row in range(0, n, rows_per_block):
+            j, i = np.meshgrid(np.arange(row, min(row + rows_per_block, n)), np.arange(n), indexing='ij')
+            p00 = np.stack([i, j, np.zeros_like(i)], axis=-1).reshape(-1, 3).astype(np.float32)
+            p10 = p00 + np.float32([1, 0, 0])
+            p01 = p00 + np.float32([0, 1, 0])
+            p11 = p00 + np.float32([1, 1, 0])
+            facets = np.zeros(2 * len(p00), dtype=STL_FACET_DTYPE)
+            facets['normal'] = [0, 0, 1]
+            facets['vertices'][0::2] = np.stack([p00, p10, p11], axis=1)
+            facets['vertices'][1::2] = np.stack([p00, p11, p01], axis=1)
+            f.write(facets.tobytes())
+
+
+def tetrahedron(points):
+    return points[[[0, 2, 1], [0, 1, 3], [1, 2, 3], [0, 3, 2]]]
+
+
+def multi_part_mesh():
+    """三個互不相連的四面體, 其中一個頂點以 -0.0 表示"""
+    tetra = np.float32([[0, 0, 0], [10, 0, 0], [0, 10, 0], [0, 0, 10]])
+    triangles = []
+    for offset in ([0, 0, 0], [50, 0, 0], [0, 80, 0]):
+        triangles.extend(tetrahedron(tetra + np.float32(offset)))
+    triangles = np.array(triangles, dtype=np.float32)[[0, 5, 9, 1, 4, 8, 2, 6, 10, 3, 7, 11]]
+    triangles[0, 0, 2] = -0.0
+    normals = np.zeros((len(triangles), 3), dtype=np.float32)
+    return triangles, normals
+
+
+def legacy_read_binary_stl(filename, scale):
+    """原本逐面 struct.unpack 的讀取方式, 作為比對基準"""
+    with open(filename, 'rb') as f:
+        f.seek(80)
+        triangle_count = struct.unpack('I', f.read(4))[0]
+
+        triangles = []
+        normals = []
+
+        for _ in range(triangle_count):
+            nx, ny, nz = struct.unpack('fff', f.read(12))
+            normals.append([nx, ny, nz])
+
+            triangle = []
+            for _ in range(3):
+                x, y, z = struct.unpack('fff', f.read(12))
+                triangle.append([x * scale, y * scale, z * scale])
+            triangles.append(triangle)
+
+            f.seek(2, 1)
+
+    return np.array(triangles), np.array(normals)
+
+
+class TestSTLConverter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.stl_path = os.path.join(self.tmpdir.name, 'mesh.stl')
+        self.cwd = os.getcwd()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def split_to(self, subdir, converter, **kwargs):
+        """在 subdir 中執行 split_and_convert, 回傳 {檔名: 內容}"""
+        workdir = os.path.join(self.tmpdir.name, subdir)
+        os.makedirs(workdir)
+        os.chdir(workdir)
+        converter.split_and_convert(**kwargs)
+        os.chdir(self.cwd)
+        parts = os.path.join(workdir, 'split_parts')
+        outputs = {}
+        for name in sorted(os.listdir(parts)):
+            # 零件紀錄 (parts_manifest.json) 在 test_incremental_split 另外檢查
+            if name == 'parts_manifest.json':
+                continue
+            with open(os.path.join(parts, name), 'rb') as f:
+                outputs[name] = f.read()
+        shutil.rmtree(workdir)
+        return outputs
+
+    def test_binary_reader_matches_legacy(self):
+        triangles, normals = random_mesh(2000)
+        write_binary_stl(self.stl_path, triangles, normals)
+
+        for scale in (0.001, 0.0025, 1.0):
+            converter = STLConverter(self.stl_path, scale=scale)
+            self.assertTrue(converter.is_binary)
+            new_triangles, new_normals = converter._read_binary_stl()
+            old_triangles, old_normals = legacy_read_binary_stl(self.stl_path, scale)
+
+            self.assertEqual(new_triangles.shape, old_triangles.shape)
+            self.assertEqual(new_triangles.dtype, old_triangles.dtype)
+            self.assertTrue(np.array_equal(new_triangles, old_triangles))
+            self.assertTrue(np.array_equal(new_normals, old_normals))
+
+    def test_binary_reader_truncated_file(self):
+        triangles, normals = random_mesh(10)
+        write_binary_stl(self.stl_path, triangles, normals)
+        with open(self.stl_path, 'r+b') as f:
+            f.truncate(84 + 50 * 7)
+
+        converter = STLConverter(self.stl_path)
+        with self.assertRaises(ValueError):
+            converter._read_binary_stl()
+
+    def test_ascii_reader_matches_line_by_line(self):
+        triangles, normals = random_mesh(500)
+        write_ascii_stl(self.stl_path, triangles.astype(np.float64).tolist(), normals.astype(np.float64).tolist())
+
+        converter = STLConverter(self.stl_path, scale=0.0025)
+        self.assertFalse(converter.is_binary)
+        old_triangles, old_normals = converter._read_ascii_stl_by_line()
+        # 標準格式的檔案不應退回逐行解析
+        converter._read_ascii_stl_by_line = lambda: self.fail("fell back to line-by-line parsing")
+        new_triangles, new_normals = converter._read_ascii_stl()
+        self.assertTrue(np.array_equal(new_triangles, old_triangles))
+        self.assertTrue(np.array_equal(new_normals, old_normals))
+
+    def test_ascii_reader_malformed(self):
+        triangles, normals = random_mesh(3)
+        write_ascii_stl(self.stl_path, triangles.tolist(), normals.tolist())
+        with open(self.stl_path) as f:
+            text = f.read()
+
+        # 數值錯誤與逐行解析一樣拋出 ValueError
+        with open(self.stl_path, 'w') as f:
+            f.write(text.replace('vertex ', 'vertex abc ', 1))
+        converter = STLConverter(self.stl_path)
+        with self.assertRaises(ValueError):
+            converter._read_ascii_stl_by_line()
+        with self.assertRaises(ValueError):
+            converter._read_ascii_stl()
+
+        # 少一個頂點時不再默默回傳不一致的陣列
+        lines = text.splitlines(True)
+        del lines[[i for i, line in enumerate(lines) if 'vertex' in line][-1]]
+        with open(self.stl_path, 'w') as f:
+            f.write(''.join(lines))
+        with self.assertRaises(ValueError):
+            STLConverter(self.stl_path)._read_ascii_stl()
+
+    def test_weld_tolerance_merges_near_vertices(self):
+        # 第二個四面體的一個頂點與第一個只差 0.0001 mm
+        first = np.float32([[0, 0, 0], [10, 0, 0], [0, 10, 0], [0, 0, 10]])
+        second = np.float32([[10.0001, 0, 0], [20, 0, 0], [10, 10, 0], [10, 0, 10]])
+        triangles = np.concatenate([tetrahedron(first), tetrahedron(second)])
+        normals = np.zeros((len(triangles), 3), dtype=np.float32)
+        write_binary_stl(self.stl_path, triangles, normals)
+
+        exact = self.split_to('exact', STLConverter(self.stl_path, scale=0.001))
+        self.assertEqual(len(exact), 4)
+
+        for streaming in (False, True):
+            converter = STLConverter(self.stl_path, scale=0.001, streaming=streaming, weld_tolerance=1e-6)
+            outputs = self.split_to(f'welded_{streaming}', converter)
+            self.assertEqual(sorted(outputs), ['part_1.mtl', 'part_1.obj'])
+            self.assertEqual(outputs['part_1.obj'].count(b'\nv '), 7)
+
+        triangles64 = triangles.astype(np.float64) * 0.001
+        vertices, faces = converter._weld_vertices(triangles64)
+        self.assertEqual(faces.dtype, np.int32)
+        self.assertEqual(len(vertices), 7)
+        self.assertTrue(np.allclose(vertices[faces], triangles64, rtol=0, atol=1e-6))
+
+    def test_connected_components(self):
+        triangles, normals = multi_part_mesh()
+        write_binary_stl(self.stl_path, triangles, normals)
+        converter = STLConverter(self.stl_path)
+        triangles, _ = converter._read_binary_stl()
+
+        vertices, faces = converter._weld_vertices(triangles)
+        components = converter._split_by_connected_components(faces, len(vertices))
+        self.assertEqual([c.tolist() for c in components], [[0, 3, 6, 9], [1, 4, 7, 10], [2, 5, 8, 11]])
+
+        # 所有雜湊都相同時改用 lexsort, 結果不變
+        with mock.patch.object(split_stl_to_obj_scale2_w_mtl, 'VERTEX_HASH_MULTIPLIERS', np.zeros(3, dtype=np.int64)):
+            collided_vertices, collided_faces = converter._weld_vertices(triangles)
+        self.assertTrue(np.array_equal(collided_vertices, vertices))
+        self.assertTrue(np.array_equal(collided_faces, faces))
+
+    def test_iter_components(self):
+        triangles, normals = multi_part_mesh()
+        normals[:, 2] = np.arange(len(normals))
+        write_binary_stl(self.stl_path, triangles, normals)
+        converter = STLConverter(self.stl_path)
+        os.chdir(self.tmpdir.name)
+
+        expected = [converter._part_mesh(vertices, faces) + (part_normals,)
+                    for vertices, faces, part_normals in converter._iter_in_memory_parts()]
+        components = list(converter.iter_components())
+        self.assertEqual([component[0] for component in components], [1, 2, 3])
+        for (_, vertices, faces, part_normals), (v, f, n) in zip(components, expected, strict=True):
+            self.assertEqual(vertices.dtype, np.float64)
+            self.assertTrue(np.array_equal(vertices, v))
+            self.assertTrue(np.array_equal(faces, f))
+            self.assertTrue(np.array_equal(part_normals, n))
+        # 每個零件都是同一組共用陣列的切片, 不另外複製
+        for index in (1, 2, 3):
+            self.assertIsNotNone(components[0][index].base)
+            self.assertIs(components[0][index].base, components[2][index].base)
+
+        for (_, vertices, faces, part_normals), (v, f, n) in zip(converter.iter_components(out_of_core=True),
+                                                                    expected, strict=True):
+            self.assertTrue(np.array_equal(vertices, v))
+            self.assertTrue(np.array_equal(faces, f))
+            self.assertTrue(np.array_equal(part_normals, n))
+        self.assertEqual(os.listdir(self.tmpdir.name), ['mesh.stl'])
+
+    def test_streaming_matches_in_memory(self):
+        triangles, normals = multi_part_mesh()
+        write_binary_stl(self.stl_path, triangles, normals)
+
+        expected = self.split_to('memory', STLConverter(self.stl_path))
+        self.assertEqual(len(expected), 6)
+        for chunk_size in (1, 5, 1000):
+            converter = STLConverter(self.stl_path, streaming=True, chunk_size=chunk_size)
+            self.assertEqual(self.split_to(f'stream_{chunk_size}', converter), expected)
+
+    def test_streaming_index_matches_weld(self):
+        # 面的順序打亂, 已知頂點分散在多個排序段中, 編號仍與一次焊接相同
+        write_grid_stl(self.stl_path, 30)
+        triangles, _ = STLConverter(self.stl_path)._read_binary_stl()
+        triangles = triangles[np.random.default_rng(2).permutation(len(triangles))]
+        converter = STLConverter(self.stl_path)
+        expected_vertices, expected_faces = converter._weld_vertices(triangles)
+        for chunk_size in (1, 3, 64, 10000):
+            chunks = (
+                (triangles[start:start + chunk_size], np.zeros((len(triangles[start:start + chunk_size]), 3)))
+                for start in range(0, len(triangles), chunk_size))
+            vertices, faces, _ = converter._index_vertex_chunks(chunks, len(triangles))
+            self.assertTrue(np.array_equal(vertices, expected_vertices))
+            self.assertTrue(np.array_equal(faces, expected_faces))
+
+    def test_out_of_core_matches_in_memory(self):
+        # 兩條彼此相連的四面體鏈, 面的順序打亂, union-find 需要多輪才能收斂
+        tetra = np.float32([[0, 0, 0], [10, 0, 0], [0, 10, 0], [0, 0, 10]])
+        triangles = [tetrahedron(tetra + np.float32([10 * k, 100 * chain, 0])) for chain in range(2) for k in range(20)]
+        triangles = np.concatenate(triangles + [multi_part_mesh()[0] + np.float32([0, 0, 500])])
+        triangles = triangles[np.random.default_rng(1).permutation(len(triangles))]
+        normals = np.zeros((len(triangles), 3), dtype=np.float32)
+        write_binary_stl(self.stl_path, triangles, normals)
+        work_dir = os.path.join(self.tmpdir.name, 'work')
+        os.makedirs(work_dir)
+
+        for weld_tolerance in (0.0, 1e-6):
+            expected = self.split_to('memory', STLConverter(self.stl_path, weld_tolerance=weld_tolerance))
+            self.assertEqual(len(expected), 10)
+            for chunk_size in (1, 7, 1000):
+                converter = STLConverter(self.stl_path, chunk_size=chunk_size, weld_tolerance=weld_tolerance)
+                outputs = self.split_to(f'disk_{chunk_size}', converter, out_of_core=True, work_dir=work_dir)
+                self.assertEqual(outputs, expected)
+                self.assertEqual(os.listdir(work_dir), [])
+
+            # 同時開啟的桶檔數有上限, 過大的桶再分成子桶, 結果不變
+            converter = STLConverter(self.stl_path, chunk_size=1, weld_tolerance=weld_tolerance)
+            with mock.patch.object(split_stl_to_obj_scale2_w_mtl, 'MAX_OPEN_BUCKETS', 3), \
+                    mock.patch.object(converter, '_scatter_buckets', wraps=converter._scatter_buckets) as scatter:
+                outputs = self.split_to(f'capped_{weld_tolerance}', converter, out_of_core=True, work_dir=work_dir)
+            self.assertEqual(outputs, expected)
+            self.assertEqual(os.listdir(work_dir), [])
+            self.assertTrue(all(call.args[2] <= 3 for call in scatter.call_args_list))
+            self.assertGreater(max(call.args[3] for call in scatter.call_args_list), 1)
+
+    def test_out_of_core_long_strip(self):
+        # 三角形長條: 逐一接上的根會形成與長條等長的鏈, 指標跳躍後找根的次數不隨長度成長
+        n = 2000
+        top = np.column_stack([np.arange(n + 1), np.zeros(n + 1), np.zeros(n + 1)]).astype(np.float32)
+        bottom = top + np.float32([0, 1, 0])
+        triangles = np.concatenate([np.stack([top[:-1], bottom[:-1], top[1:]], axis=1),
+                                    np.stack([bottom[:-1], bottom[1:], top[1:]], axis=1)])
+        write_binary_stl(self.stl_path, triangles, np.zeros((len(triangles), 3), dtype=np.float32))
+        converter = STLConverter(self.stl_path)
+        with mock.patch.object(split_stl_to_obj_scale2_w_mtl.np, 'array_equal', wraps=np.array_equal) as passes:
+            parts = list(converter.iter_components(out_of_core=True))
+        self.assertEqual(len(parts), 1)
+        self.assertEqual(len(parts[0][2]), 2 * n)
+        self.assertEqual(len(parts[0][1]), 2 * (n + 1))
+        self.assertLess(passes.call_count, 100)
+
+    def test_parallel_export_matches_serial(self):
+        triangles, normals = multi_part_mesh()
+        write_binary_stl(self.stl_path, triangles, normals)
+
+        summaries = {}
+        outputs = {}
+        for workers in (1, 2):
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                outputs[workers] = self.split_to(f'workers_{workers}', STLConverter(self.stl_path), workers=workers)
+            summaries[workers] = stdout.getvalue()
+        self.assertEqual(len(outputs[1]), 6)
+        self.assertEqual(outputs[2], outputs[1])
+        self.assertEqual(summaries[2], summaries[1])
+
+        # 無法建立程序池時改為逐一輸出
+        with mock.patch.object(split_stl_to_obj_scale2_w_mtl, 'ProcessPoolExecutor', side_effect=OSError):
+            with contextlib.redirect_stdout(io.StringIO()):
+                fallback = self.split_to('fallback', STLConverter(self.stl_path), workers=4)
+        self.assertEqual(fallback, outputs[1])
+
+    def test_stl_output(self):
+        triangles, normals = multi_part_mesh()
+        normals = np.random.default_rng(3).uniform(-1.0, 1.0, size=normals.shape).astype(np.float32)
+        write_binary_stl(self.stl_path, triangles, normals)
+        converter = STLConverter(self.stl_path, scale=1.0)
+        obj_only = self.split_to('obj', converter)
+        outputs = self.split_to('both', converter, formats=('obj', 'stl'))
+        self.assertEqual(sorted(outputs), sorted(list(obj_only) + ['part_1.stl', 'part_2.stl', 'part_3.stl']))
+        self.assertEqual({name: data for name, data in outputs.items() if not name.endswith('.stl')}, obj_only)
+
+        # 每個零件的 STL 保留原本的面、法向量與順序 (焊接後 -0.0 與 0.0 視為同一頂點)
+        for part, facet_indices in enumerate([[0, 3, 6, 9], [1, 4, 7, 10], [2, 5, 8, 11]]):
+            data = outputs[f'part_{part + 1}.stl']
+            self.assertEqual(data[:84], b'\x00' * 80 + struct.pack('<I', 4))
+            facets = np.frombuffer(data[84:], dtype=STL_FACET_DTYPE)
+            self.assertTrue(np.array_equal(facets['vertices'], triangles[facet_indices]))
+            self.assertTrue(np.array_equal(facets['normal'], normals[facet_indices]))
+            self.assertTrue(np.all(facets['attr'] == 0))
+
+        with self.assertRaises(ValueError):
+            converter.split_and_convert(formats=('obj', 'fbx'))
+
+    def test_ply_output(self):
+        triangles, normals = multi_part_mesh()
+        write_binary_stl(self.stl_path, triangles, normals)
+        outputs = self.split_to('ply', STLConverter(self.stl_path), formats=('obj', 'ply'))
+        self.assertEqual(sum(name.endswith('.ply') for name in outputs), 3)
+
+        for part in range(1, 4):
+            ply_path = os.path.join(self.tmpdir.name, f'part_{part}.ply')
+            with open(ply_path, 'wb') as f:
+                f.write(outputs[f'part_{part}.ply'])
+            vertices, faces = read_binary_ply(ply_path)
+            self.assertEqual(faces.dtype, np.int32)
+
+            # 與 OBJ 的頂點順序與面索引相同
+            lines = outputs[f'part_{part}.obj'].decode().splitlines()
+            obj_vertices = np.array([line.split()[1:] for line in lines if line.startswith('v ')], dtype=np.float64)
+            obj_faces = np.array([[c.split('//')[0] for c in line.split()[1:]] for line in lines if line.startswith('f ')], dtype=np.int32) - 1
+            self.assertTrue(np.array_equal(vertices, obj_vertices.astype(np.float32)))
+            self.assertTrue(np.array_equal(faces, obj_faces))
+
+    def test_quantized_mesh_round_trip(self):
+        # 起伏的格網曲面, 法向量隨機, 前 10 個面的法向量為 0
+        n = 40
+        j, i = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+        p00 = np.stack([i, j, np.zeros_like(i)], axis=-1).reshape(-1, 3).astype(np.float64) * 3.7
+        triangles = np.concatenate([np.stack([p00, p00 + [3.7, 0, 0], p00 + [3.7, 3.7, 0]], axis=1),
+                                    np.stack([p00, p00 + [3.7, 3.7, 0], p00 + [0, 3.7, 0]], axis=1)])
+        triangles[..., 2] = 20 * np.sin(triangles[..., 0] / 30) * np.cos(triangles[..., 1] / 40)
+        normals = random_mesh(len(triangles))[1]
+        normals[:10] = 0.0
+        write_binary_stl(self.stl_path, triangles.astype(np.float32), normals)
+        converter = STLConverter(self.stl_path)
+        outputs = self.split_to('qmesh', converter, formats=('qmesh',))
+        (_, vertices, faces, part_normals), = list(converter.iter_components())
+        self.assertEqual(list(outputs), ['part_1.qmesh'])
+        self.assertLess(len(outputs['part_1.qmesh']), 0.5 * os.path.getsize(self.stl_path))
+
+        filename = os.path.join(self.tmpdir.name, 'part_1.qmesh')
+        with open(filename, 'wb') as f:
+            f.write(outputs['part_1.qmesh'])
+        mesh, = split_stl_to_obj_scale2_w_mtl.read_quantized_mesh(filename)
+        self.assertEqual((mesh['name'], mesh['vertex_count'], mesh['face_count']), ('part_1', len(vertices), len(faces)))
+        self.assertTrue(np.array_equal(mesh['faces'], faces))
+        # 座標誤差不超過量化步長的一半
+        step = np.asarray(mesh['position_step'])
+        self.assertTrue(np.allclose(step, (vertices.max(axis=0) - vertices.min(axis=0)) / 65535))
+        self.assertTrue(np.all(np.abs(mesh['vertices'] - vertices) <= step / 2 + 1e-12))
+        # 8 位元八面體編碼的法向量誤差在 1 度以內, 長度為 0 的法向量改用幾何法向量
+        unit = part_normals.copy()
+        unit[10:] /= np.linalg.norm(unit[10:], axis=1, keepdims=True)
+        corners = vertices[faces[:10]]
+        geometric = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        unit[:10] = geometric / np.linalg.norm(geometric, axis=1, keepdims=True)
+        self.assertGreater(np.min(np.sum(mesh['normals'] * unit, axis=1)), np.cos(np.radians(1.0)))
+
+        # 多個網格放在同一個容器中, 16 位元法向量更精確
+        bundle = os.path.join(self.tmpdir.name, 'bundle.qmesh')
+        tetra = np.float64([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]])
+        tetra_faces = np.array([[0, 2, 1], [0, 1, 3], [1, 2, 3], [0, 3, 2]])
+        tetra_normals = np.array([[0, 0, -1], [0, -1, 0], [3 ** -0.5] * 3, [-1, 0, 0]])
+        split_stl_to_obj_scale2_w_mtl.write_quantized_mesh(
+            bundle, [('tetra', tetra, tetra_faces, tetra_normals), ('grid', vertices, faces, unit)], normal_bits=16)
+        tetra_mesh, grid_mesh = split_stl_to_obj_scale2_w_mtl.read_quantized_mesh(bundle)
+        self.assertTrue(np.array_equal(tetra_mesh['vertices'], tetra))
+        self.assertTrue(np.array_equal(tetra_mesh['faces'], tetra_faces))
+        self.assertTrue(np.allclose(tetra_mesh['normals'], tetra_normals, atol=1e-4))
+        self.assertTrue(np.array_equal(grid_mesh['faces'], faces))
+        self.assertGreater(np.min(np.sum(grid_mesh['normals'] * unit, axis=1)), np.cos(np.radians(0.01)))
+
+        with open(bundle, 'r+b') as f:
+            f.truncate(os.path.getsize(bundle) - 1)
+        with self.assertRaises(ValueError):
+            split_stl_to_obj_scale2_w_mtl.read_quantized_mesh(bundle)
+        with self.assertRaises(ValueError):
+            split_stl_to_obj_scale2_w_mtl.write_quantized_mesh(bundle, [], position_bits=17)
+
+    def test_instancing(self):
+        # 不對稱的四面體: 原件、平移、旋轉後打亂面順序的複本, 以及一個鏡像件
+        tetra = np.float32([[0, 0, 0], [10, 0, 0], [0, 20, 0], [0, 0, 35]])
+        angle = 0.7
+        rotation = np.array([[np.cos(angle), -np.sin(angle), 0], [np.sin(angle), np.cos(angle), 0], [0, 0, 1]])
+        rotation = rotation @ np.array([[1, 0, 0], [0, 0, -1], [0, 1, 0]])
+        rotated = tetrahedron(tetra @ rotation.T + np.float32([100, 0, 0]))[[2, 0, 3, 1]]
+        mirrored = tetrahedron(tetra * np.float32([-1, 1, 1]) + np.float32([0, 100, 0]))[:, [0, 2, 1]]
+        triangles = np.concatenate([
+            tetrahedron(tetra), tetrahedron(tetra + np.float32([0, 0, 100])), rotated, mirrored,
+        ]).astype(np.float32)
+        normals = np.zeros((len(triangles), 3), dtype=np.float32)
+        write_binary_stl(self.stl_path, triangles, normals)
+
+        converter = STLConverter(self.stl_path, scale=0.001)
+        plain = self.split_to('plain', converter)
+        outputs = self.split_to('instanced', converter, instancing=True)
+        self.assertEqual(sorted(name for name in outputs if name.endswith('.obj')), ['part_1.obj', 'part_4.obj'])
+        instances = json.loads(outputs['instances.json'])['instances']
+        self.assertEqual([i['mesh'] for i in instances], ['part_1', 'part_1', 'part_1', 'part_4'])
+
+        def obj_vertices(data):
+            return np.array([line.split()[1:] for line in data.decode().splitlines() if line.startswith('v ')], dtype=np.float64)
+
+        for instance in instances:
+            source = obj_vertices(outputs[instance['mesh'] + '.obj'])
+            target = obj_vertices(plain[f"part_{instance['part']}.obj"])
+            moved = source @ np.array(instance['rotation_matrix']).T + instance['translation']
+            distances = np.linalg.norm(moved[:, None] - target[None], axis=2)
+            self.assertLess(distances.min(axis=1).max(), 1e-6)
+            self.assertLess(distances.min(axis=0).max(), 1e-6)
+
+            # Webots 的 rotation (軸角) 與旋轉矩陣一致
+            x, y, z, theta = instance['rotation']
+            k = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+            matrix = np.eye(3) + np.sin(theta) * k + (1 - np.cos(theta)) * k @ k
+            self.assertTrue(np.allclose(matrix, instance['rotation_matrix'], atol=1e-6))
+
+    def test_mass_properties(self):
+        # 1 x 2 x 3 的長方體, 一個放在原點, 另一個旋轉後平移
+        corners = np.float32([[x, y, z] for x in (0, 1) for y in (0, 2) for z in (0, 3)])
+        quads = [[0, 1, 3, 2], [4, 6, 7, 5], [0, 4, 5, 1], [2, 3, 7, 6], [0, 2, 6, 4], [1, 5, 7, 3]]
+        box = np.array([corners[[a, b, c]] for q in quads for a, b, c in ((q[0], q[1], q[2]), (q[0], q[2], q[3]))])
+        angle = 0.4
+        rotation = np.array([[1, 0, 0], [0, np.cos(angle), -np.sin(angle)], [0, np.sin(angle), np.cos(angle)]])
+        moved = (box - [0.5, 1.0, 1.5]) @ rotation.T + [10, 20, 30]
+        triangles = np.concatenate([box, moved]).astype(np.float32)
+        write_binary_stl(self.stl_path, triangles, np.zeros((len(triangles), 3), dtype=np.float32))
+
+        outputs = self.split_to('mass', STLConverter(self.stl_path, scale=0.01), density=1000.0)
+        parts = json.loads(outputs['mass_properties.json'])['parts']
+        self.assertEqual([p['part'] for p in parts], [1, 2])
+
+        mass = 1000.0 * 0.01 * 0.02 * 0.03
+        expected = mass / 12 * np.diag([0.02 ** 2 + 0.03 ** 2, 0.01 ** 2 + 0.03 ** 2, 0.01 ** 2 + 0.02 ** 2])
+        for part, center, inertia in ((parts[0], [0.005, 0.01, 0.015], expected),
+                                      (parts[1], [0.1, 0.2, 0.3], rotation @ expected @ rotation.T)):
+            self.assertTrue(part['closed'])
+            self.assertAlmostEqual(part['volume'], 6e-6, delta=6e-11)
+            self.assertAlmostEqual(part['mass'], mass, delta=mass * 1e-5)
+            self.assertTrue(np.allclose(part['center_of_mass'], center, rtol=0, atol=1e-7))
+            self.assertTrue(np.allclose(part['inertia_tensor'], inertia, rtol=1e-5, atol=1e-15))
+            physics = part['webots_physics']
+            self.assertEqual(physics['density'], -1)
+            self.assertEqual(physics['centerOfMass'], [part['center_of_mass']])
+            self.assertTrue(np.allclose(physics['inertiaMatrix'], [np.diag(inertia), inertia[[0, 0, 1], [1, 2, 2]]],
+                                        rtol=1e-5, atol=1e-15))
+
+    def test_bounding_primitives(self):
+        # 旋轉後的 1 x 2 x 3 長方體應以 OBB 貼合
+        corners = np.float32([[x, y, z] for x in (0, 1) for y in (0, 2) for z in (0, 3)])
+        quads = [[0, 1, 3, 2], [4, 6, 7, 5], [0, 4, 5, 1], [2, 3, 7, 6], [0, 2, 6, 4], [1, 5, 7, 3]]
+        box = np.array([corners[[a, b, c]] for q in quads for a, b, c in ((q[0], q[1], q[2]), (q[0], q[2], q[3]))])
+        angle = 0.4
+        rotation = np.array([[np.cos(angle), 0, np.sin(angle)], [0, 1, 0], [-np.sin(angle), 0, np.cos(angle)]])
+        triangles = (box @ rotation.T + [5, 5, 5]).astype(np.float32)
+        write_binary_stl(self.stl_path, triangles, np.zeros((len(triangles), 3), dtype=np.float32))
+
+        outputs = self.split_to('bounding', STLConverter(self.stl_path, scale=1.0), bounding=True)
+        part = json.loads(outputs['bounding_objects.json'])['parts'][0]
+        self.assertEqual(part['primitive'], 'obb')
+        self.assertAlmostEqual(part['volume_ratio'], 1.0, places=4)
+        self.assertLess(part['candidates']['obb'], part['candidates']['aabb'])
+        self.assertIn('Box {', part['webots'])
+        self.assertIn('rotation', part['webots'])
+        self.assertIn(part['webots'], outputs['bounding_objects.txt'].decode())
+
+        # 每種基本形狀都包住所有頂點; 球面與膠囊面上的點分別以球與膠囊最貼合
+        converter = STLConverter(self.stl_path)
+        rng = np.random.default_rng(4)
+        directions = rng.normal(size=(2000, 3))
+        directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+        sphere = directions * 2.0 + [1, 2, 3]
+        capsule = directions * 0.5
+        capsule[:, 2] += np.where(capsule[:, 2] > 0, 3.0, -3.0)
+        capsule = capsule @ rotation.T + [-1, 0, 4]
+        # 這組頂點的膠囊高度為 0, 球心不在頂點的平均位置
+        flat = np.random.default_rng(381).normal(size=(8, 3))
+        for points, expected in ((sphere, 'sphere'), (capsule, 'capsule'), (flat, None)):
+            primitives = converter._bounding_primitives(points)
+            if expected is None:
+                self.assertEqual(primitives['capsule'][1]['height'], 0.0)
+            else:
+                self.assertEqual(min(primitives, key=lambda k: primitives[k][0]), expected)
+            for name, (_, parameters) in primitives.items():
+                local = (points - parameters['center']) @ parameters.get('rotation', np.eye(3))
+                if name in ('aabb', 'obb'):
+                    self.assertTrue(np.all(np.abs(local) <= parameters['size'] / 2 + 1e-9))
+                elif name == 'sphere':
+                    self.assertTrue(np.all(np.linalg.norm(local, axis=1) <= parameters['radius'] + 1e-9))
+                else:
+                    axial = np.clip(local[:, 2], -parameters['height'] / 2, parameters['height'] / 2)
+                    distance = np.linalg.norm(local - np.column_stack([np.zeros((len(local), 2)), axial]), axis=1)
+                    self.assertTrue(np.all(distance <= parameters['radius'] + 1e-9))
+
+    def test_result_cache(self):
+        triangles, normals = multi_part_mesh()
+        write_binary_stl(self.stl_path, triangles, normals)
+        cache_dir = os.path.join(self.tmpdir.name, 'cache')
+
+        def run(subdir, converter, **kwargs):
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                outputs = self.split_to(subdir, converter, cache_dir=cache_dir, **kwargs)
+            return outputs, stdout.getvalue()
+
+        expected, first_summary = run('first', STLConverter(self.stl_path))
+        self.assertEqual(expected, self.split_to('plain', STLConverter(self.stl_path)))
+
+        # 相同的輸入與設定不再分割, 輸出檔案與摘要相同
+        converter = STLConverter(self.stl_path)
+        with mock.patch.object(converter, '_split_and_convert', side_effect=AssertionError("cache miss")):
+            cached, summary = run('cached', converter)
+        self.assertEqual(cached, expected)
+        self.assertTrue(summary.startswith(first_summary))
+
+        # 快取的摘要依這次的輸出目錄印出路徑
+        other_dir = os.path.join(self.tmpdir.name, 'other', 'parts')
+        os.makedirs(os.path.dirname(other_dir))
+        stdout = io.StringIO()
+        with mock.patch.object(converter, '_split_and_convert', side_effect=AssertionError("cache miss")), \
+                contextlib.redirect_stdout(stdout):
+            converter.split_and_convert(cache_dir=cache_dir, output_dir=other_dir)
+        self.assertIn(f"OBJ: {os.path.join(other_dir, 'part_1.obj')}\n", stdout.getvalue())
+        self.assertNotIn('split_parts', stdout.getvalue().replace(cache_dir, ''))
+        self.assertLessEqual(set(expected), set(os.listdir(other_dir)))
+
+        # 設定或檔案內容改變時重新分割
+        self.assertIn('part_1.ply', run('ply', STLConverter(self.stl_path), formats=('obj', 'ply'))[0])
+        self.assertNotEqual(run('scaled', STLConverter(self.stl_path, scale=1.0))[0], expected)
+        triangles[0, 0, 0] += 1.0
+        write_binary_stl(self.stl_path, triangles, normals)
+        os.utime(self.stl_path, ns=(0, 0))
+        self.assertNotEqual(run('modified', STLConverter(self.stl_path))[0], expected)
+        entries = [name for name in os.listdir(cache_dir) if name != 'digests.json']
+        self.assertEqual(len(entries), 4)
+
+        # 超過容量上限時只保留最近使用的結果
+        sizes = {}
+        for name in entries:
+            with open(os.path.join(cache_dir, name, 'meta.json'), encoding='utf-8') as f:
+                sizes[name] = json.load(f)['size']
+        run('evict', STLConverter(self.stl_path, scale=2.0), cache_size_limit=1)
+        remaining = [name for name in os.listdir(cache_dir) if name != 'digests.json']
+        self.assertEqual(len(remaining), 0)
+        run('small', STLConverter(self.stl_path, scale=3.0), cache_size_limit=10 ** 9)
+        run('small_2', STLConverter(self.stl_path, scale=4.0), cache_size_limit=max(sizes.values()) + 1)
+        self.assertEqual(len([name for name in os.listdir(cache_dir) if name != 'digests.json']), 1)
+
+    def test_incremental_split(self):
+        tetra = np.float32([[0, 0, 0], [10, 0, 0], [0, 10, 0], [0, 0, 10]])
+        offsets = [[0, 0, 0], [50, 0, 0], [0, 80, 0], [0, 0, 120]]
+        workdir = os.path.join(self.tmpdir.name, 'incremental')
+        os.makedirs(workdir)
+        os.chdir(workdir)
+        parts_dir = os.path.join(workdir, 'split_parts')
+
+        def run(pieces, **kwargs):
+            triangles = np.concatenate(pieces).astype(np.float32)
+            write_binary_stl(self.stl_path, triangles, np.zeros((len(triangles), 3), dtype=np.float32))
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                count = STLConverter(self.stl_path).split_and_convert(incremental=True, **kwargs)
+            with open(os.path.join(parts_dir, 'parts_manifest.json'), encoding='utf-8') as f:
+                manifest = json.load(f)
+            mtimes = {name: os.stat(os.path.join(parts_dir, name)).st_mtime_ns for name in os.listdir(parts_dir)}
+            return count, stdout.getvalue(), manifest, mtimes
+
+        parts = [tetrahedron(tetra + np.float32(offset)) for offset in offsets]
+        count, summary, manifest, before = run(parts)
+        self.assertEqual(count, 4)
+        self.assertEqual([record['part'] for record in manifest['parts']], [1, 2, 3, 4])
+        self.assertEqual(manifest['parts'][0]['files'], ['part_1.obj', 'part_1.mtl'])
+        centroids = {record['part']: record['centroid'] for record in manifest['parts']}
+
+        # 零件順序改變、第 2 個零件被放大、第 3 個被刪除、另外加入一個新零件
+        edited = tetrahedron(tetra * np.float32(1.2) + np.float32(offsets[1]))
+        extra = tetrahedron(tetra + np.float32([200, 200, 200]))
+        time.sleep(0.01)
+        count, summary, manifest, after = run([parts[3], extra, edited, parts[0]])
+        self.assertEqual(count, 4)
+        self.assertIn("增量分割: 2 個零件未變更, 修改 [2], 新增 [5], 刪除 [3]", summary)
+        self.assertEqual([record['part'] for record in manifest['parts']], [1, 2, 4, 5])
+        for part in (1, 4):
+            self.assertEqual(next(r['centroid'] for r in manifest['parts'] if r['part'] == part), centroids[part])
+            self.assertEqual(after[f'part_{part}.obj'], before[f'part_{part}.obj'])
+        self.assertNotEqual(after['part_2.obj'], before['part_2.obj'])
+        self.assertNotIn('part_3.obj', after)
+        self.assertNotIn('part_3.mtl', after)
+        self.assertIn('part_5.obj', after)
+
+        # 輸出設定改變時即使內容相同也重新輸出, 但編號不變
+        count, summary, manifest, again = run([parts[3], extra, edited, parts[0]], formats=('obj', 'ply'))
+        self.assertIn("增量分割: 0 個零件未變更, 修改 [], 新增 [], 刪除 []", summary)
+        self.assertEqual(manifest['parts'][0]['files'], ['part_1.obj', 'part_1.mtl', 'part_1.ply'])
+
+        # 重新匯出時面的順序與各面的起始角點改變, 內容相同仍視為未變更
+        reordered = np.roll(parts[0][::-1], 1, axis=1)
+        count, summary, manifest, _ = run([edited, reordered, extra, parts[3]], formats=('obj', 'ply'))
+        self.assertIn("增量分割: 4 個零件未變更, 修改 [], 新增 [], 刪除 []", summary)
+        self.assertEqual([record['part'] for record in manifest['parts']], [1, 2, 4, 5])
+
+    def test_batch_cli(self):
+        triangles, normals = multi_part_mesh()
+        for name in ('a', 'b'):
+            os.makedirs(os.path.join(self.tmpdir.name, name))
+            write_binary_stl(os.path.join(self.tmpdir.name, name, f'{name}.stl'), triangles, normals)
+        expected = self.split_to('single', STLConverter(os.path.join(self.tmpdir.name, 'a', 'a.stl')))
+        os.chdir(self.tmpdir.name)
+
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            status = split_stl_to_obj_scale2_w_mtl.main(
+                ['*/a.stl', 'b', 'missing.stl', '--no-cache', '--workers', '2', '--timing-json', 'timing.json'])
+        self.assertEqual(status, 1)
+        with open('timing.json', encoding='utf-8') as f:
+            timings = json.load(f)['files']
+        self.assertEqual([t['file'] for t in timings], [os.path.join('a', 'a.stl'), os.path.join('b', 'b.stl'), 'missing.stl'])
+        self.assertEqual([t['parts'] for t in timings], [3, 3, None])
+        self.assertIsNotNone(timings[2]['error'])
+        self.assertIn("檔案耗時", stdout.getvalue())
+        for name in ('a', 'b'):
+            parts = os.path.join(self.tmpdir.name, name, 'split_parts')
+            for filename, data in expected.items():
+                with open(os.path.join(parts, filename), 'rb') as f:
+                    self.assertEqual(f.read(), data)
+
+    def test_stage_instrumentation(self):
+        triangles, normals = multi_part_mesh()
+        write_binary_stl(self.stl_path, triangles, normals)
+        log_file = os.path.join(self.tmpdir.name, 'stats.jsonl')
+        output_dir = Path(self.tmpdir.name, 'parts')
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            # 預設不記錄, 回傳值不變
+            self.assertEqual(STLConverter(self.stl_path).split_and_convert(output_dir=output_dir), 3)
+            part_count, stats = STLConverter(self.stl_path).split_and_convert(
+                output_dir=output_dir, density=1000.0, instrument=True, log_file=log_file)
+            part_count_ooc, stats_ooc = STLConverter(self.stl_path).split_and_convert(
+                output_dir=Path(self.tmpdir.name, 'parts_ooc'), out_of_core=True, instrument=True)
+
+        self.assertEqual(part_count, 3)
+        self.assertEqual((stats['facets'], stats['vertices'], stats['components']), (12, 12, 3))
+        self.assertFalse(stats['cached'])
+        self.assertEqual(set(stats['stages']), {'read', 'weld', 'split', 'manifest', 'mass_properties', 'write'})
+        self.assertEqual(set(stats_ooc['stages']), {'bucket', 'label', 'route', 'split', 'manifest', 'write'})
+        self.assertEqual((stats_ooc['facets'], stats_ooc['vertices'], part_count_ooc), (12, 12, 3))
+        # 巢狀階段不重複計時, 各階段合計不超過總耗時
+        self.assertLessEqual(sum(stage['seconds'] for stage in stats['stages'].values()), stats['seconds'])
+        self.assertEqual(stats['bytes_written'], sum(path.stat().st_size for path in output_dir.iterdir()))
+        if split_stl_to_obj_scale2_w_mtl.resource is not None:
+            self.assertGreater(stats['peak_rss'], 0)
+
+        # 只有指定 log_file 的那次附加一行 JSON
+        with open(log_file, encoding='utf-8') as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0]), stats)
+
+    def test_obj_writer_precision(self):
+        rng = np.random.default_rng(2)
+        vertices = rng.uniform(-1.0, 1.0, size=(50, 3)) * 0.001
+        faces = rng.integers(0, 50, size=(200, 3)).astype(np.int32)
+        normals = rng.uniform(-1.0, 1.0, size=(200, 3)).astype(np.float32)
+        obj_path = Path(self.tmpdir.name) / 'part.obj'
+
+        # 預設輸出與原本逐行 f.write 的格式完全相同
+        write_binary_stl(self.stl_path, *multi_part_mesh())
+        converter = STLConverter(self.stl_path)
+        converter._write_obj(obj_path, vertices, faces, normals)
+        with open(obj_path, encoding='utf-8') as f:
+            full = f.read()
+        used, first_index, inverse = np.unique(faces.ravel(), return_index=True, return_inverse=True)
+        order = np.argsort(first_index, kind='stable')
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(1, len(order) + 1)
+        expected = "mtllib part.mtl\nusemtl part\n\n"
+        for v in vertices[used[order]].tolist():
+            expected += f"v {v[0]} {v[1]} {v[2]}\n"
+        for n in normals.astype(np.float64).tolist():
+            expected += f"vn {n[0]} {n[1]} {n[2]}\n"
+        for i, face in enumerate(rank[inverse].reshape(-1, 3).tolist()):
+            expected += f"f {face[0]}//{i+1} {face[1]}//{i+1} {face[2]}//{i+1}\n"
+        self.assertEqual(full, expected)
+
+        # 精簡模式: 檔案較小, 座標在指定有效位數內相同
+        converter.obj_precision = 6
+        converter._write_obj(obj_path, vertices, faces, normals)
+        with open(obj_path, encoding='utf-8') as f:
+            compact = f.read()
+        self.assertLess(len(compact), len(full) * 0.7)
+        compact_lines = compact.splitlines()
+        full_lines = full.splitlines()
+        self.assertEqual(len(compact_lines), len(full_lines))
+        for compact_line, full_line in zip(compact_lines[3:], full_lines[3:], strict=True):
+            compact_fields, full_fields = compact_line.split(), full_line.split()
+            if full_fields[0] == 'f':
+                self.assertEqual(compact_fields, full_fields)
+            else:
+                self.assertTrue(np.allclose(np.float64(compact_fields[1:]), np.float64(full_fields[1:]), rtol=1e-5, atol=0))
+
+    def test_morton_order(self):
+        n = 16
+        write_grid_stl(self.stl_path, n)
+        converter = STLConverter(self.stl_path, morton_order=True)
+        outputs = self.split_to('morton', converter, formats=('stl', 'ply'))
+        expected = self.split_to('plain', STLConverter(self.stl_path), formats=('stl', 'ply'))
+
+        # 只改變面與頂點的順序, 三角形本身不變
+        facets = np.frombuffer(outputs['part_1.stl'][84:], dtype=STL_FACET_DTYPE)
+        original = np.frombuffer(expected['part_1.stl'][84:], dtype=STL_FACET_DTYPE)
+        self.assertEqual(sorted(facets.tobytes()[i:i + 50] for i in range(0, facets.nbytes, 50)),
+                         sorted(original.tobytes()[i:i + 50] for i in range(0, original.nbytes, 50)))
+        codes = converter._morton_codes(facets['vertices'].astype(np.float64).mean(axis=1))
+        self.assertTrue(np.all(np.diff(codes.astype(np.float64)) >= 0))
+
+        # 頂點依排序後的面第一次出現的順序編號
+        ply_path = os.path.join(self.tmpdir.name, 'part_1.ply')
+        with open(ply_path, 'wb') as f:
+            f.write(outputs['part_1.ply'])
+        vertices, faces = read_binary_ply(ply_path)
+        self.assertTrue(np.array_equal(vertices[faces], facets['vertices']))
+        first_use = np.unique(faces.ravel(), return_index=True)[1]
+        self.assertTrue(np.all(np.diff(first_use) > 0))
+
+        # 2x2 格點的 Morton 碼依 x、y、z 位元交錯
+        self.assertEqual(converter._morton_codes(np.float64([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]])).tolist(),
+                         [0, 0x1249249249249249, 0x1249249249249249 << 1, 0x1249249249249249 << 2])
+
+    def test_smooth_normals(self):
+        # 立方體: 每個面兩個三角形, 法向量朝外
+        corners = np.float32([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)])
+        quads = [[0, 1, 3, 2], [4, 6, 7, 5], [0, 4, 5, 1], [2, 3, 7, 6], [0, 2, 6, 4], [1, 5, 7, 3]]
+        triangles = np.array([corners[[a, b, c]] for q in quads for a, b, c in ((q[0], q[1], q[2]), (q[0], q[2], q[3]))])
+        normals = np.zeros((len(triangles), 3), dtype=np.float32)
+        write_binary_stl(self.stl_path, triangles, normals)
+
+        per_face = self.split_to('face', STLConverter(self.stl_path, scale=1.0))
+        self.assertEqual(per_face['part_1.obj'].count(b'\nvn '), 12)
+
+        # 直角小於 crease_angle 時相鄰面不平滑, 同一面的兩個三角形共用一個法向量
+        sharp = self.split_to('sharp', STLConverter(self.stl_path, scale=1.0, smooth_normals=True))['part_1.obj']
+        lines = sharp.decode().splitlines()
+        vn = np.array([line.split()[1:] for line in lines if line.startswith('vn ')], dtype=np.float64)
+        self.assertEqual(len(vn), 6)
+        self.assertTrue(np.allclose(np.abs(vn).sum(axis=1), 1.0))
+        self.assertLess(len(sharp), len(per_face['part_1.obj']))
+
+        # crease_angle 超過直角時每個頂點只有一個朝外 (接近對角線方向) 的法向量
+        converter = STLConverter(self.stl_path, scale=1.0, smooth_normals=True, crease_angle=np.pi / 2 + 0.1)
+        smooth = self.split_to('smooth', converter)['part_1.obj'].decode().splitlines()
+        vn = np.array([line.split()[1:] for line in smooth if line.startswith('vn ')], dtype=np.float64)
+        v = np.array([line.split()[1:] for line in smooth if line.startswith('v ')], dtype=np.float64)
+        self.assertEqual(len(vn), 8)
+        for line in smooth:
+            if line.startswith('f '):
+                for corner in line.split()[1:]:
+                    vertex, normal = (int(i) - 1 for i in corner.split('//'))
+                    diagonal = (v[vertex] - 0.5) / np.linalg.norm(v[vertex] - 0.5)
+                    self.assertGreater(vn[normal] @ diagonal, 0.9)
+
+        # 細分的圓錐: 頂點與中心各有 500 個相鄰面, 分批計算與逐對計算的結果相同
+        m = 500
+        angle = np.linspace(0, 2 * np.pi, m, endpoint=False)
+        rim = np.column_stack([np.cos(angle), np.sin(angle), 0.1 * np.sin(5 * angle)])
+        vertices = np.vstack([[0, 0, 1], [0, 0, 0], rim])
+        ring = 2 + np.arange(m)
+        corners = np.concatenate([np.column_stack([np.zeros(m, int), ring, np.roll(ring, -1)]),
+                                  np.column_stack([np.ones(m, int), np.roll(ring, -1), ring])])
+        weighted = np.cross(vertices[corners[:, 1]] - vertices[corners[:, 0]],
+                            vertices[corners[:, 2]] - vertices[corners[:, 0]])
+        unit = weighted / np.linalg.norm(weighted, axis=1, keepdims=True)
+        expected = np.empty((len(corners), 3, 3))
+        for face, corner in np.ndindex(len(corners), 3):
+            sharing = np.flatnonzero((corners == corners[face, corner]).any(axis=1))
+            sharing = sharing[unit[sharing] @ unit[face] >= np.cos(converter.crease_angle)]
+            expected[face, corner] = weighted[sharing].sum(axis=0) / np.linalg.norm(weighted[sharing].sum(axis=0))
+        for pair_chunk, dense_valence in ((1 << 20, 64), (1000, 64), (1 << 20, 10 ** 6), (777, 10 ** 6)):
+            with mock.patch.multiple(split_stl_to_obj_scale2_w_mtl, NORMAL_PAIR_CHUNK=pair_chunk,
+                                     NORMAL_DENSE_VALENCE=dense_valence):
+                table, ids = converter._vertex_normals(vertices, corners, np.zeros((len(corners), 3)))
+            self.assertTrue(np.allclose(table[ids], expected))
+
+    def test_streaming_memory_ceiling(self):
+        n = 1000
+        write_grid_stl(self.stl_path, n)
+        converter = STLConverter(self.stl_path, scale=0.001, streaming=True, chunk_size=1 << 16)
+
+        tracemalloc.start()
+        try:
+            vertices, faces, normals = converter._read_indexed_stl()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(len(faces), 2 * n * n)
+        self.assertEqual(len(vertices), (n + 1) ** 2)
+        self.assertEqual(faces.dtype, np.int32)
+        self.assertTrue(np.allclose(vertices.max(axis=0), [n * 0.001, n * 0.001, 0]))
+        self.assertLess(peak, converter.streaming_memory_ceiling(len(faces), len(vertices)))
+        # 頂點索引之外的暫存記憶體只與 chunk_size 有關
+        index_bytes = faces.nbytes + normals.nbytes + vertices.nbytes
+        self.assertLess(peak - index_bytes, os.path.getsize(self.stl_path) / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,13 @@ import struct
 import numpy as np
 from pathlib import Path
 
+# 二進制 STL 每個面固定 50 bytes: 法向量、三個頂點 (皆為 little-endian float32) 與 2 bytes 屬性
+STL_FACET_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attr', '<u2'),
+])
+
 class STLConverter:
     def __init__(self, filename, scale=0.001):  # 新增 scale 參數，預設 0.001 將 mm 轉換為 m
         self.filename = filename
@@ -15,28 +22,19 @@ class STLConverter:
             return not header.startswith('solid')
     
     def _read_binary_stl(self):
-        """讀取二進制 STL 檔案"""
+        """讀取二進制 STL 檔案 (以結構化 dtype 一次讀入整個面資料表)"""
         with open(self.filename, 'rb') as f:
             f.seek(80)
-            triangle_count = struct.unpack('I', f.read(4))[0]
-            
-            triangles = []
-            normals = []
-            
-            for _ in range(triangle_count):
-                nx, ny, nz = struct.unpack('fff', f.read(12))
-                normals.append([nx, ny, nz])
-                
-                triangle = []
-                for _ in range(3):
-                    x, y, z = struct.unpack('fff', f.read(12))
-                    # 在讀取頂點時進行縮放
-                    triangle.append([x * self.scale, y * self.scale, z * self.scale])
-                triangles.append(triangle)
-                
-                f.seek(2, 1)
-                
-        return np.array(triangles), np.array(normals)
+            triangle_count = struct.unpack('<I', f.read(4))[0]
+            facets = np.fromfile(f, dtype=STL_FACET_DTYPE, count=triangle_count)
+        
+        if len(facets) != triangle_count:
+            raise ValueError(f"STL 檔案不完整: 標頭記載 {triangle_count} 個面, 實際只讀到 {len(facets)} 個")
+        
+        # 在讀取頂點時進行縮放 (整個頂點陣列一次相乘)
+        triangles = facets['vertices'].astype(np.float64) * self.scale
+        normals = facets['normal'].astype(np.float64)
+        return triangles, normals
     
     def _read_ascii_stl(self):
         """讀取 ASCII STL 檔案"""